@@ -0,0 +1 @@
+"""Benchmarks for justifier; run each module with `python -m benchmarks.<name>`."""
@@ -0,0 +1,36 @@
+"""
+Throughput of the fused engine compared with the coroutine pipeline.
+"""
+
+import time
+import logging
+
+import justifier   # This package's top-level module
+from justifier.api import Justifier
+from . import corpus
+
+
+# *** FUNCTIONS ***
+def run(text: str, **options) -> float:
+    j = Justifier(lang='en_US', seed=0, **options)
+    start = time.perf_counter()
+    j.justify(text)
+    return time.perf_counter() - start
+
+
+def main():
+    justifier.init_logging(logging.WARNING)
+
+    for lines_per_para in (1, 20):
+        text = corpus.make_text(20000 // lines_per_para, lines_per_para=lines_per_para)
+        mb = len(text) / 1e6
+        for hyphenation in ('none', 'simple', 'pyphen'):
+            results = []
+            for engine in ('pipeline', 'fused'):
+                elapsed = run(text, line_width=60, hyphenation=hyphenation, engine=engine)
+                results.append("%-8s %6.2f MB/s" % (engine, mb / elapsed))
+            print("%2d lines/para %-6s: %s" % (lines_per_para, hyphenation, "  ".join(results)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Startup time and memory of compiled hyphenation dictionaries against
+pyphen's, each measured in a fresh process: the time to load the dictionary
+and hyphenate the first word, the time to hyphenate a few thousand words,
+and how much the process's RSS grows.  With several worker processes,
+pyphen's parsed patterns are private to each of them, whereas a compiled
+dictionary's pages are mapped from the one file and shared.
+
+    python -m benchmarks.bench_hyphdict [LANG ...]
+"""
+
+import os
+import sys
+import time
+import resource
+import tempfile
+import subprocess
+
+from . import corpus
+
+
+# *** DEFINITIONS ***
+DEFAULT_LANGS = ('en_US', 'de_DE', 'hu_HU')
+NUM_WORDS = 5000
+
+
+# *** FUNCTIONS ***
+def rss_kb() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() // 1024
+    except OSError:
+        # The peak instead, which is inherited from the parent process; in
+        # kilobytes on Linux, but bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def child(kind: str, lang: str, dict_file: str):
+    """
+    Runs in a fresh process; prints the load time, the time for the rest of
+    the words and the growth in RSS.
+    """
+
+    words = corpus.make_words(NUM_WORDS, min_len=6, max_len=14)
+    base_rss = rss_kb()
+    start = time.perf_counter()
+    if kind == 'pyphen':
+        import pyphen
+        hyphenator = pyphen.Pyphen(lang=lang)
+    else:
+        from justifier.hyphdict import CompiledDict
+        hyphenator = CompiledDict(dict_file)
+    list(hyphenator.iterate(words[0]))
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for word in words[1:]:
+        list(hyphenator.iterate(word))
+    print(load_time, time.perf_counter() - start, rss_kb() - base_rss)
+
+
+def run(kind: str, lang: str, dict_file: str):
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=package_dir)
+    result = subprocess.run([sys.executable, "-m", "benchmarks.bench_hyphdict", "--child", kind, lang, dict_file],
+                            capture_output=True, text=True, check=True, env=env)
+    load_time, lookup_time, rss = result.stdout.split()
+    print("%-6s %-9s %10.2f ms %10.2f ms %9d KB" % (lang, kind, float(load_time) * 1000,
+                                                   float(lookup_time) * 1000, int(rss)))
+
+
+def main():
+    from justifier.hyphdict import compile_dict
+
+    langs = sys.argv[1:] or DEFAULT_LANGS
+    print("%-6s %-9s %13s %13s %12s" % ("lang", "dict", "load+1 word", "%d words" % (NUM_WORDS - 1), "RSS growth"))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for lang in langs:
+            dict_file = os.path.join(tmpdir, lang + ".hyd")
+            compile_dict(dict_file, lang)
+            run('pyphen', lang, dict_file)
+            run('compiled', lang, dict_file)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        child(*sys.argv[2:5])
+    else:
+        main()
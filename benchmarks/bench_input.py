@@ -0,0 +1,57 @@
+"""
+Input throughput: line-by-line text-mode reading with one send() per line,
+against block reads with batches of lines.  The file size in MB can be given
+as an argument, e.g. `python -m benchmarks.bench_input 1024`.
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from justifier import justifier as engine
+from justifier import utils
+from . import corpus
+
+
+# *** FUNCTIONS ***
+def discard():
+    while True:
+        yield
+
+
+def make_file(filename: str, size_mb: int):
+    block = (corpus.make_text(1000) + "\n\n").encode("utf-8")
+    with open(filename, "wb") as f:
+        for _ in range(max(1, size_mb * 1000000 // len(block))):
+            f.write(block)
+
+
+def run(filename: str, batched: bool) -> float:
+    sink = discard()
+    sink.send(None)
+    p = utils.Pipeline(engine.get_paras, sink)
+    start = time.perf_counter()
+    if batched:
+        with open(filename, "rb") as f:
+            p.send_all(utils.read_lines(f, encoding="utf-8"))
+    else:
+        with open(filename, encoding="utf-8") as f:
+            p.send_lines(f)
+    p.close()
+    return time.perf_counter() - start
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    with tempfile.TemporaryDirectory() as dirname:
+        filename = os.path.join(dirname, "input.txt")
+        make_file(filename, size_mb)
+        mb = os.path.getsize(filename) / 1e6
+        for batched in (False, True):
+            elapsed = run(filename, batched)
+            print("%-12s %8.3f s  %7.2f MB/s" % (batched and "blocks" or "line by line", elapsed, mb / elapsed))
+
+
+if __name__ == "__main__":
+    main()
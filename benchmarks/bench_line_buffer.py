@@ -0,0 +1,87 @@
+"""
+Time and memory used in building, padding and rendering lines, with a reused
+justifier.LineBuffer compared with a new list of Chunks per line (as
+optimal.py still does), with the memory allocated for each line measured
+with tracemalloc.
+"""
+
+import time
+import random
+import logging
+import tracemalloc
+
+import justifier   # This package's top-level module
+from justifier import justifier as engine
+from . import corpus
+
+
+# *** DEFINITIONS ***
+WORDS_PER_LINE = 10
+
+
+# *** FUNCTIONS ***
+def chunk_lines(words, rng):
+    for n in range(0, len(words), WORDS_PER_LINE):
+        line_chunks = [engine.Chunk(word, " ") for word in words[n:n + WORDS_PER_LINE]]
+        num_gaps = len(line_chunks) - 1
+        sentence_end_gaps = [k for k in range(num_gaps) if line_chunks[k].word.endswith(engine.SENTENCE_ENDINGS)]
+        yield engine.render_line(line_chunks, engine.distribute_padding(num_gaps, sentence_end_gaps, 7, rng))
+
+
+def buffer_lines(words, rng):
+    line = engine.LineBuffer()
+    for n in range(0, len(words), WORDS_PER_LINE):
+        line.clear()
+        for word in words[n:n + WORDS_PER_LINE]:
+            line.append(word, " ")
+        line.pad(7, rng)
+        yield line.render()
+
+
+def measure(fn, words):
+    """
+    Returns the time taken and the mean memory allocated in making each line,
+    i.e. the most in use at once while making it, counting only what was
+    allocated for that line (its words, Chunks, padding and so on, as well
+    as the line itself).  The output is discarded as it's made.
+    """
+
+    rng = random.Random(0)
+    lines = fn(words, rng)
+    num_lines = 0
+    total_peak = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    while True:
+        # Forget earlier allocations, so that the peak is this line's alone
+        tracemalloc.clear_traces()
+        line = next(lines, None)
+        if line is None:
+            break
+        total_peak += tracemalloc.get_traced_memory()[1]
+        num_lines += 1
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+
+    return elapsed, total_peak / num_lines
+
+
+def main():
+    justifier.init_logging(logging.WARNING)
+
+    words = corpus.make_words(1000000)
+    for name, fn in (("Chunk lists", chunk_lines), ("LineBuffer", buffer_lines)):
+        # Untraced timing first, since tracemalloc slows allocation down a lot
+        rng = random.Random(0)
+        start = time.perf_counter()
+        for line in fn(words, rng):
+            pass
+        untraced = time.perf_counter() - start
+
+        elapsed, bytes_per_line = measure(fn, words)
+        print("%-12s %6.3f s  (traced %6.3f s)  %6.0f bytes allocated per line" %
+              (name, untraced, elapsed, bytes_per_line))
+
+
+if __name__ == "__main__":
+    main()
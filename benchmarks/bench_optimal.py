@@ -0,0 +1,36 @@
+"""
+Throughput of optimal line breaking compared with the greedy path.
+"""
+
+import time
+import logging
+
+import justifier   # This package's top-level module
+from justifier.api import Justifier
+from . import corpus
+
+
+# *** FUNCTIONS ***
+def run(text: str, **options) -> float:
+    j = Justifier(lang='en_US', seed=0, **options)
+    start = time.perf_counter()
+    j.justify(text)
+    return time.perf_counter() - start
+
+
+def main():
+    justifier.init_logging(logging.WARNING)
+
+    text = corpus.make_text(500, lines_per_para=20)
+    mb = len(text) / 1e6
+    for hyphenation in ('none', 'pyphen'):
+        for line_width in (40, 72, 120):
+            results = []
+            for optimal in (False, True):
+                elapsed = run(text, line_width=line_width, hyphenation=hyphenation, optimal=optimal)
+                results.append("%s %6.2f MB/s" % (optimal and "optimal" or "greedy", mb / elapsed))
+            print("%-6s width %3d: %s" % (hyphenation, line_width, "  ".join(results)))
+
+
+if __name__ == "__main__":
+    main()
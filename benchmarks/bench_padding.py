@@ -0,0 +1,43 @@
+"""
+Folding and padding at increasing line widths.
+"""
+
+import time
+import logging
+
+import justifier   # This package's top-level module
+from justifier import justifier as engine
+from justifier import utils
+from . import corpus
+
+
+# *** FUNCTIONS ***
+def discard():
+    while True:
+        yield
+
+
+def run(text: str, line_width: int) -> float:
+    sink = discard()
+    sink.send(None)
+    p = utils.Pipeline(engine.get_paras,
+                       (engine.reformat, {'line_width': line_width, 'hyphenation': 'none'}),
+                       sink)
+    start = time.perf_counter()
+    p.send_all(text.split("\n"))
+    p.close()
+    return time.perf_counter() - start
+
+
+def main():
+    justifier.init_logging(logging.WARNING)
+
+    text = corpus.make_text(2000, lines_per_para=10)
+    mb = len(text) / 1e6
+    for line_width in (40, 72, 200, 400):
+        elapsed = run(text, line_width)
+        print("width %3d: %8.3f s  %6.2f MB/s" % (line_width, elapsed, mb / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Throughput of the library API with different numbers of worker processes.
+"""
+
+import os
+import time
+
+from justifier.api import Justifier
+from . import corpus
+
+
+# *** FUNCTIONS ***
+def run(text: str, jobs: int) -> float:
+    with Justifier(line_width=72, hyphenation='pyphen', lang='en_US', jobs=jobs) as j:
+        # Start the workers before timing
+        j.justify(text[:1000])
+        start = time.perf_counter()
+        j.justify(text)
+        return time.perf_counter() - start
+
+
+def main():
+    text = corpus.make_text(20000)
+    mb = len(text) / 1e6
+    jobs = 1
+    while jobs <= (os.cpu_count() or 1):
+        elapsed = run(text, jobs)
+        print("%3d jobs: %8.3f s  %6.2f MB/s" % (jobs, elapsed, mb / elapsed))
+        jobs *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Paragraph assembly and tokenising of a single very long paragraph; the time
+per line should stay flat as the paragraph grows.
+"""
+
+import time
+import logging
+
+import justifier   # This package's top-level module
+from justifier import justifier as engine
+from justifier import utils
+from . import corpus
+
+
+# *** FUNCTIONS ***
+def discard():
+    while True:
+        yield
+
+
+def run(num_lines: int) -> float:
+    lines = corpus.make_lines(num_lines)
+
+    sink = discard()
+    sink.send(None)
+    p = utils.Pipeline(engine.get_paras, (engine.reformat, {'hyphenation': 'none'}), sink)
+    start = time.perf_counter()
+    p.send_all(lines)
+    p.close()
+    return time.perf_counter() - start
+
+
+def main():
+    justifier.init_logging(logging.WARNING)
+
+    for num_lines in (1000, 10000, 100000):
+        elapsed = run(num_lines)
+        print("%7d lines: %8.3f s  %6.2f us/line" % (num_lines, elapsed, elapsed / num_lines * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Many one-line paragraphs, where per-paragraph setup costs dominate.
+"""
+
+import time
+import logging
+
+import justifier   # This package's top-level module
+from justifier import justifier as engine
+from justifier import utils
+from . import corpus
+
+
+# *** FUNCTIONS ***
+def discard():
+    while True:
+        yield
+
+
+def run(num_paras: int) -> float:
+    lines = []
+    for line in corpus.make_lines(num_paras, words_per_line=6):
+        lines.append(line)
+        lines.append("")
+
+    sink = discard()
+    sink.send(None)
+    p = utils.Pipeline(engine.get_paras,
+                       (engine.reformat, {'line_width': 72, 'indent': 2, 'hyphenation': 'none'}),
+                       sink)
+    start = time.perf_counter()
+    p.send_all(lines)
+    p.close()
+    return time.perf_counter() - start
+
+
+def main():
+    justifier.init_logging(logging.WARNING)
+
+    num_paras = 200000
+    elapsed = run(num_paras)
+    print("%d paragraphs: %8.3f s  %6.2f us/paragraph" % (num_paras, elapsed, elapsed / num_paras * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Deterministic synthetic text for benchmarks.
+"""
+
+from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, Callable, Generator, Type, Optional, TextIO, IO
+import random
+
+
+# *** DEFINITIONS ***
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+BASE64_CHARS = LETTERS + LETTERS.upper() + "0123456789+/"
+
+# Relative frequencies of word lengths 1-15 in English running text, roughly
+ENGLISH_WORD_LENGTHS = (3, 17, 20, 16, 11, 8, 8, 6, 4, 3, 2, 1, 0.5, 0.3, 0.2)
+
+
+# *** FUNCTIONS ***
+def make_words(count: int, seed: int = 0, min_len: int = 1, max_len: int = 12,
+               distribution: str = 'uniform', sentence_len: int = 0) -> List[str]:
+    """
+    @p distribution: 'uniform' between `min_len` and `max_len`, or 'english'
+                     (which ignores them)
+    @p sentence_len: If non-zero, end a sentence (with a full stop) after
+                     about this many words on average
+    """
+
+    def english_length() -> int:
+        return rng.choices(range(1, len(ENGLISH_WORD_LENGTHS) + 1), ENGLISH_WORD_LENGTHS)[0]
+
+
+    # -- make_words() --
+    rng = random.Random(seed)
+    if distribution == 'english':
+        length_fn = english_length
+    elif distribution == 'uniform':
+        length_fn = lambda: rng.randint(min_len, max_len)
+    else:
+        raise ValueError("Unknown distribution '%s'" % distribution)
+
+    words = ["".join(rng.choice(LETTERS) for _ in range(length_fn())) for _ in range(count)]
+    if sentence_len:
+        for n in range(count):
+            if rng.random() < 1 / sentence_len:
+                words[n] += "."
+    return words
+
+
+def make_lines(num_lines: int, words_per_line: int = 10, seed: int = 0, **word_options) -> List[str]:
+    """
+    A single paragraph as a list of lines, i.e. with no blank lines.
+    @p word_options: Passed to make_words()
+    """
+
+    words = make_words(num_lines * words_per_line, seed, **word_options)
+    return [" ".join(words[n:n + words_per_line]) for n in range(0, len(words), words_per_line)]
+
+
+def make_text(num_paras: int, lines_per_para: int = 5, words_per_line: int = 10, seed: int = 0,
+              para_jitter: int = 0, **word_options) -> str:
+    """
+    Paragraphs separated by blank lines, as a single string.
+    @p para_jitter: Paragraphs have `lines_per_para` lines, give or take up
+                    to this many (but at least one)
+    @p word_options: Passed to make_words()
+    """
+
+    if para_jitter:
+        rng = random.Random(seed)
+        para_lengths = [max(1, lines_per_para + rng.randint(-para_jitter, para_jitter)) for _ in range(num_paras)]
+    else:
+        para_lengths = [lines_per_para] * num_paras
+
+    lines = make_lines(sum(para_lengths), words_per_line, seed, **word_options)
+    paras = []
+    n = 0
+    for length in para_lengths:
+        paras.append("\n".join(lines[n:n + length]))
+        n += length
+    return "\n\n".join(paras)
+
+
+def make_long_tokens(count: int, seed: int = 0) -> List[str]:
+    """
+    Long tokens of the kind found in logs and technical writing: URLs,
+    snake_case and camelCase identifiers and base64, in equal numbers.
+    """
+
+    def name(length: int) -> str:
+        return "".join(rng.choice(LETTERS) for _ in range(length))
+
+
+    # -- make_long_tokens() --
+    rng = random.Random(seed)
+    tokens = []
+    for n in range(count):
+        kind = n % 4
+        if kind == 0:
+            tokens.append("https://%s.example.com/%s/%s.html" % (name(8), name(10), name(12)))
+        elif kind == 1:
+            tokens.append("_".join(name(rng.randint(3, 9)) for _ in range(rng.randint(3, 6))))
+        elif kind == 2:
+            tokens.append(name(rng.randint(3, 8)) + "".join(name(rng.randint(3, 8)).title()
+                                                          for _ in range(rng.randint(2, 5))))
+        else:
+            tokens.append("".join(rng.choice(BASE64_CHARS) for _ in range(rng.randint(24, 80))) + "==")
+    return tokens
+
+
+def make_token_text(num_paras: int, lines_per_para: int = 5, words_per_line: int = 10, seed: int = 0,
+                    token_ratio: float = 0.3) -> str:
+    """
+    Like make_text(), but with about `token_ratio` of the words replaced by
+    make_long_tokens().
+    """
+
+    rng = random.Random(seed)
+    words = make_text(num_paras, lines_per_para, words_per_line, seed, distribution='english').split(" ")
+    tokens = make_long_tokens(len(words), seed)
+    for n in range(len(words)):
+        # Keep the line and paragraph breaks
+        if "\n" not in words[n] and rng.random() < token_ratio:
+            words[n] = tokens[n]
+    return " ".join(words)
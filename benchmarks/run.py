@@ -0,0 +1,350 @@
+"""
+Benchmark suite: times each stage of justification, each engine and
+hyphenation mode, and whole command-line runs, on a synthetic corpus.
+Results can be saved as JSON and compared with those from another commit:
+
+    python -m benchmarks.run --output new.json --compare old.json
+"""
+
+from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, Callable, Generator, Type, Optional, TextIO, IO
+import os
+import sys
+import json
+import atexit
+import shutil
+import time
+import random
+import logging
+import platform
+import statistics
+import subprocess
+import tempfile
+from collections import OrderedDict
+
+import click
+
+import justifier   # This package's top-level module
+from justifier import justifier as engine
+from justifier import utils
+from justifier import fused
+from justifier.api import Justifier
+from . import corpus
+
+
+# *** DEFINITIONS ***
+RESULTS_VERSION = 1
+SLOWER_THRESHOLD = 1.1   # Ratio above which a comparison is flagged
+
+# Name -> function that takes the corpus text and settings and returns a
+# function to time
+BENCHMARKS = OrderedDict()
+
+
+# *** FUNCTIONS ***
+def benchmark(name: str):
+    def register(setup_fn: Callable) -> Callable:
+        BENCHMARKS[name] = setup_fn
+        return setup_fn
+
+    return register
+
+
+def para_lists(text: str) -> List[List[str]]:
+    return [para.split("\n") for para in text.split("\n\n")]
+
+
+@benchmark("paras/get_paras")
+def setup_get_paras(text: str, settings: Dict) -> Callable:
+    lines = text.split("\n")
+
+    def run():
+        p = utils.Pipeline(engine.get_paras, utils.Collector)
+        p.send_all([lines])
+        p.close()
+
+    return run
+
+
+@benchmark("tokenise/generic")
+def setup_tokenise_generic(text: str, settings: Dict) -> Callable:
+    # The lookahead regex used for custom separators
+    paras = para_lists(text)
+    reo = engine.make_word_regex()
+
+    def run():
+        for para in paras:
+            engine.tokenise(para, reo)
+
+    return run
+
+
+@benchmark("tokenise/fast")
+def setup_tokenise_fast(text: str, settings: Dict) -> Callable:
+    paras = para_lists(text)
+
+    def run():
+        for para in paras:
+            engine.tokenise(para)
+
+    return run
+
+
+@benchmark("fold/greedy-pipeline")
+def setup_fold_pipeline(text: str, settings: Dict) -> Callable:
+    paras = [engine.tokenise(para) for para in para_lists(text)]
+
+    def run():
+        p = utils.Pipeline((engine.create_folded_para,
+                            {'line_width': settings['width'], 'hyphenation': 'none', 'seed': 0}),
+                           utils.Collector)
+        for chunks in paras:
+            p.send(chunks)
+            p.send(None)
+        p.close()
+
+    return run
+
+
+@benchmark("fold/greedy-fused")
+def setup_fold_fused(text: str, settings: Dict) -> Callable:
+    paras = [engine.tokenise(para) for para in para_lists(text)]
+
+    def run():
+        rng = random.Random(0)
+        for chunks in paras:
+            fused.fold_para(chunks, settings['width'], None, rng)
+
+    return run
+
+
+@benchmark("fold/optimal")
+def setup_fold_optimal(text: str, settings: Dict) -> Callable:
+    from justifier.optimal import create_optimal_para
+
+    paras = [engine.tokenise(para) for para in para_lists(text)]
+
+    def run():
+        p = utils.Pipeline((create_optimal_para, {'line_width': settings['width'], 'hyphenation': 'none', 'seed': 0}),
+                           utils.Collector)
+        for chunks in paras:
+            p.send(chunks)
+            p.send(None)
+        p.close()
+
+    return run
+
+
+@benchmark("padding/distribute")
+def setup_padding(text: str, settings: Dict) -> Callable:
+    # One call per output line, with typical numbers of gaps and sentence ends
+    rng = random.Random(0)
+    num_lines = len(text) // settings['width']
+    calls = []
+    for _ in range(num_lines):
+        num_gaps = rng.randint(1, max(1, settings['width'] // 6))
+        calls.append((num_gaps, sorted(rng.sample(range(num_gaps), rng.randint(0, min(2, num_gaps)))),
+                      rng.randint(0, 8)))
+
+    def run():
+        padding = []
+        rng = random.Random(0)
+        for num_gaps, sentence_end_gaps, delta in calls:
+            engine.distribute_padding(num_gaps, sentence_end_gaps, delta, rng, padding)
+
+    return run
+
+
+def setup_engine(engine_name: str, hyphenation: str) -> Callable:
+    def setup(text: str, settings: Dict) -> Callable:
+        def run():
+            # A new Justifier each time, so that the hyphenation cache starts cold
+            Justifier(line_width=settings['width'], hyphenation=hyphenation, lang='en_US', seed=0,
+                      engine=engine_name).justify(text)
+
+        return run
+
+    return setup
+
+
+try:
+    import numpy
+    ENGINE_NAMES = ('pipeline', 'fused', 'numpy')
+except ImportError:
+    ENGINE_NAMES = ('pipeline', 'fused')
+
+for engine_name in ENGINE_NAMES:
+    for hyphenation in ('none', 'simple', 'pyphen'):
+        benchmark("engine/%s/%s" % (engine_name, hyphenation))(setup_engine(engine_name, hyphenation))
+
+
+@benchmark("hyphenate/simple-long-tokens")
+def setup_hyphenate_simple(text: str, settings: Dict) -> Callable:
+    # The splitting alone, for the kind of token that is usually hyphenated
+    # over and over again
+    tokens = corpus.make_long_tokens(20000)
+    rng = random.Random(0)
+    calls = [(token, rng.randint(4, settings['width'] // 2)) for token in tokens]
+    hypenate_fn = engine.get_hypenate_fn('simple', line_width=settings['width'])
+
+    def run():
+        for token, delta in calls:
+            hypenate_fn(token, delta)
+
+    return run
+
+
+def setup_long_tokens(skip_urls: bool) -> Callable:
+    def setup(text: str, settings: Dict) -> Callable:
+        token_text = corpus.make_token_text(len(text) // 3000 + 1)
+
+        def run():
+            Justifier(line_width=settings['width'], hyphenation='simple', skip_urls=skip_urls,
+                      seed=0).justify(token_text)
+
+        return run
+
+    return setup
+
+
+benchmark("long-tokens/simple")(setup_long_tokens(False))
+benchmark("long-tokens/simple-skip-urls")(setup_long_tokens(True))
+
+
+# Rendering the same document at several widths, e.g. terminal, email and web
+WIDTHS = (80, 72, 100)
+
+
+@benchmark("widths/full-runs")
+def setup_widths_full(text: str, settings: Dict) -> Callable:
+    def run():
+        # As separate runs would, starting with a cold hyphenation cache
+        for width in WIDTHS:
+            Justifier(line_width=width, hyphenation='pyphen', lang='en_US', seed=0).justify(text)
+
+    return run
+
+
+@benchmark("widths/prepared")
+def setup_widths_prepared(text: str, settings: Dict) -> Callable:
+    from justifier.prepared import prepare
+
+    def run():
+        doc = prepare(text.split("\n"), 'pyphen', lang='en_US')
+        for width in WIDTHS:
+            doc.render(width, seed=0)
+
+    return run
+
+
+@benchmark("widths/rendered")
+def setup_widths_rendered(text: str, settings: Dict) -> Callable:
+    # Rendering alone, once the document's been prepared (or loaded) and its
+    # hyphenation points are known
+    from justifier.prepared import prepare
+
+    doc = prepare(text.split("\n"), 'pyphen', lang='en_US')
+
+    def run():
+        for width in WIDTHS:
+            doc.render(width, seed=0)
+
+    return run
+
+
+@benchmark("cli/end-to-end")
+def setup_cli(text: str, settings: Dict) -> Callable:
+    tmpdir = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, tmpdir)
+    input_path = os.path.join(tmpdir, "input.txt")
+    with open(input_path, "w") as f:
+        f.write(text)
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(justifier.__file__)))
+    env = dict(os.environ, PYTHONPATH=package_dir)
+    args = [sys.executable, "-m", "justifier.cli", "-w", str(settings['width']), "--seed", "0",
+            "-o", os.devnull, input_path]
+
+    def run():
+        subprocess.run(args, env=env, check=True)
+
+    return run
+
+
+def measure(run: Callable, repeat: int) -> List[float]:
+    run()   # Warm up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict, old_results: Dict):
+    print()
+    print("%-28s %10s %10s %7s" % ("benchmark", "old (s)", "new (s)", "ratio"))
+    for name, result in results['results'].items():
+        old = old_results['results'].get(name)
+        if old:
+            ratio = result['min'] / old['min']
+            print("%-28s %10.4f %10.4f %7.2f%s" % (name, old['min'], result['min'], ratio,
+                                                     "  SLOWER" if ratio > SLOWER_THRESHOLD else ""))
+
+
+@click.command(help="Run the benchmark suite")
+@click.option("--paras", type=int, default=2000, help="Number of paragraphs in the corpus")
+@click.option("--lines-per-para", type=int, default=8, help="Average lines per paragraph")
+@click.option("--para-jitter", type=int, default=4, help="Maximum variation in lines per paragraph")
+@click.option("--words-per-line", type=int, default=10, help="Words per input line")
+@click.option("--distribution", type=click.Choice(['uniform', 'english']), default='english', help="Word lengths")
+@click.option("--sentence-len", type=int, default=15, help="Average words per sentence")
+@click.option("--width", type=int, default=72, help="Line width to justify to")
+@click.option("--seed", type=int, default=0, help="Seed for the corpus")
+@click.option("--repeat", type=click.IntRange(min=1), default=5, help="Timed runs of each benchmark")
+@click.option("--filter", "-k", "name_filter", help="Only run benchmarks whose names contain this")
+@click.option("--output", "-o", type=click.Path(dir_okay=False), help="Save the results to a JSON file")
+@click.option("--compare", "compare_file", type=click.File("r"), help="Compare with results saved earlier")
+def main(paras: int, lines_per_para: int, para_jitter: int, words_per_line: int, distribution: str,
+         sentence_len: int, width: int, seed: int, repeat: int, name_filter: Optional[str],
+         output: Optional[str], compare_file: Optional[TextIO]):
+    justifier.init_logging(logging.WARNING)
+
+    corpus_settings = {'paras': paras, 'lines_per_para': lines_per_para, 'para_jitter': para_jitter,
+                       'words_per_line': words_per_line, 'distribution': distribution,
+                       'sentence_len': sentence_len, 'seed': seed}
+    text = corpus.make_text(paras, lines_per_para, words_per_line, seed, para_jitter=para_jitter,
+                            distribution=distribution, sentence_len=sentence_len)
+    settings = {'width': width}
+    mb = len(text.encode("utf-8")) / 1e6
+
+    results = {'version': RESULTS_VERSION,
+               'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+               'commit': git_commit(),
+               'python': platform.python_version(),
+               'corpus': dict(corpus_settings, megabytes=mb),
+               'settings': dict(settings, repeat=repeat),
+               'results': OrderedDict()}
+    for name, setup_fn in BENCHMARKS.items():
+        if name_filter and name_filter not in name:
+            continue
+        times = measure(setup_fn(text, settings), repeat)
+        results['results'][name] = {'min': min(times), 'median': statistics.median(times),
+                                    'mb_per_s': mb / min(times)}
+        print("%-28s %9.4f s  %8.2f MB/s" % (name, min(times), mb / min(times)))
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+    if compare_file:
+        compare(results, json.load(compare_file))
+
+
+if __name__ == "__main__":
+    main()
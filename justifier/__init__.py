@@ -10,7 +10,6 @@ __email__ = 'alastair@plug.org.au'
 __version__ = '0.10.0'
 
 root_logger = None  # logging.Logger
-params = {}
 
 
 # *** FUNCTIONS ***
@@ -0,0 +1,130 @@
+"""
+Asyncio front end: justify text from an asyncio.StreamReader or other async
+source without blocking the event loop, so that one loop can handle many
+streams at once.
+"""
+
+from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, AsyncIterable, AsyncIterator, Callable, Generator, Type, Optional, TextIO, IO
+import codecs
+import locale
+import asyncio
+from concurrent.futures import Executor
+
+from . import justifier
+from . import utils
+from .api import Justifier
+
+
+# *** DEFINITIONS ***
+END = object()   # Marks the end of the input in a paragraph queue
+
+
+# *** FUNCTIONS ***
+async def read_lines(source: Union[asyncio.StreamReader, AsyncIterable[AnyStr]], encoding: Optional[str] = None,
+                     errors: str = 'strict', block_size: int = utils.DEFAULT_BLOCK_SIZE) -> AsyncIterator[List[str]]:
+    """
+    Like utils.read_lines(), yield lists of lines without their line endings
+    or trailing whitespace.  A StreamReader is read in blocks, so lines can
+    be any length; any other source should yield single lines, as bytes or
+    strings.
+    @p encoding: For bytes; defaults to the locale's preferred encoding
+    """
+
+    decoder = codecs.getincrementaldecoder(encoding or locale.getpreferredencoding(False))(errors)
+    if isinstance(source, asyncio.StreamReader):
+        pieces = []   # Incomplete last line so far, one piece per block
+        while True:
+            block = await source.read(block_size)
+            if not block:
+                break
+            lines = utils.complete_lines(decoder.decode(block), pieces)
+            if lines:
+                yield lines
+
+        pieces.append(decoder.decode(b"", final=True))
+        partial = "".join(pieces)
+        if partial:
+            yield [partial.rstrip()]
+    else:
+        async for line in source:
+            yield [(decoder.decode(line) if isinstance(line, bytes) else line).rstrip()]
+
+
+async def split_paras(source: Union[asyncio.StreamReader, AsyncIterable[AnyStr]], queue: asyncio.Queue,
+                      encoding: Optional[str] = None, errors: str = 'strict'):
+    """
+    Put each paragraph (a list of lines) from `source` into `queue` as soon
+    as it's complete, waiting whenever the queue is full, followed by END or
+    the exception that stopped it.
+    """
+
+    p = utils.Pipeline(justifier.get_paras, utils.Collector)
+    paras = p.chain[-1].items
+    try:
+        async for lines in read_lines(source, encoding, errors):
+            p.send(lines)
+            for para in paras:
+                await queue.put(para)
+            paras.clear()
+        p.close()
+        for para in paras:
+            await queue.put(para)
+    except Exception as e:
+        await queue.put(e)
+    else:
+        await queue.put(END)
+
+
+async def justify_paras(engine: Justifier, source: Union[asyncio.StreamReader, AsyncIterable[AnyStr]],
+                        executor: Optional[Executor] = None, batch_size: int = justifier.DEFAULT_BATCH_SIZE,
+                        encoding: Optional[str] = None, errors: str = 'strict') -> AsyncIterator[str]:
+    """
+    Async generator that justifies text from `source` (see read_lines()) and
+    yields each paragraph as a string of newline-separated lines.
+
+    Input is read ahead by at most `batch_size` paragraphs, so a slow
+    consumer holds up the reading.  Whatever paragraphs are ready (up to
+    `batch_size`) are formatted together by `engine` in `executor`, so a
+    paragraph isn't held back waiting for more input.
+    @p executor: Defaults to the event loop's; formatting is done by
+                 `engine`'s worker processes if it has any
+    """
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(batch_size)
+    reader = asyncio.ensure_future(split_paras(source, queue, encoding, errors))
+    try:
+        end = None
+        while end is None:
+            batch = [await queue.get()]
+            while len(batch) < batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            if batch[-1] is END or isinstance(batch[-1], Exception):
+                end = batch.pop()
+
+            if batch:
+                for para in await loop.run_in_executor(executor, engine.format_paras, batch):
+                    yield para
+
+        if end is not END:
+            raise end
+
+    finally:
+        reader.cancel()
+
+
+async def justify_lines(engine: Justifier, source: Union[asyncio.StreamReader, AsyncIterable[AnyStr]],
+                        **kwargs) -> AsyncIterator[str]:
+    """
+    Async generator like justify_paras() but yielding the output lines,
+    without line endings and with an empty string between paragraphs.
+    @p kwargs: See justify_paras()
+    """
+
+    first = True
+    async for para in justify_paras(engine, source, **kwargs):
+        if not first:
+            yield ""
+        for line in para.split("\n"):
+            yield line
+        first = False
@@ -0,0 +1,190 @@
+"""
+Library interface, for use without the command line, module globals or stdout.
+"""
+
+from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, Iterator, Callable, Generator, Type, Optional, TextIO, IO
+import locale
+import threading
+
+from . import justifier
+from . import hyphenation as hyphenation_mod
+from . import utils
+
+
+# *** CLASSES ***
+class Justifier:
+    """
+    A justification engine that is configured once and can then be used
+    repeatedly, including from several threads at once; each call builds its
+    own chain of coroutines, so no state is shared between calls except the
+    (thread-safe) hyphenation cache.
+
+    With `jobs` > 1, paragraphs are spread across a pool of worker processes
+    that is started on first use and kept until close() is called; the
+    parallel module (and multiprocessing) is only imported then.
+    """
+
+    def __init__(self, line_width: int = justifier.DEFAULT_LINE_WIDTH, indent: int = 0,
+                 hyphenation: str = 'pyphen', lang: Optional[str] = None,
+                 sep_regex: str = justifier.DEFAULT_SEP_REGEX,
+                 hyphen_cache: Optional[hyphenation_mod.HyphenationCache] = None,
+                 hyphen_dict_file: Optional[str] = None, skip_urls: bool = False,
+                 optimal: bool = False, seed: Optional[int] = None, jobs: int = 1, batch_size: int = justifier.DEFAULT_BATCH_SIZE,
+                 engine: str = 'auto'):
+        """
+        @p hyphenation: 'pyphen', 'simple' or 'none'
+        @p lang: Language for pyphen, defaulting to the current locale's
+        @p hyphen_cache: Share an existing cache, e.g. with another Justifier
+        @p hyphen_dict_file: Compiled dictionary (see hyphdict) to use instead
+                             of pyphen's, whose language replaces `lang`
+        @p skip_urls: Don't hyphenate words that look like URLs or identifiers
+        @p optimal: Choose line breaks for the whole paragraph at once,
+                    rather than filling each line in turn
+        @p seed: Makes padding reproducible
+        @p jobs: Number of worker processes
+        @p batch_size: Number of paragraphs (or documents, for justify_many())
+                       sent to a worker at a time
+        @p engine: 'auto', 'fused' or 'pipeline'; see justifier.select_reformat()
+        @raise ValueError: If any are invalid or they can't be used together,
+                           as for justifier.Options
+        """
+
+        self.options = justifier.Options(line_width=line_width, indent=indent, hyphenation=hyphenation, lang=lang,
+                                         hyphen_dict_file=hyphen_dict_file, skip_urls=skip_urls,
+                                         sep_regex=sep_regex, seed=seed, optimal=optimal, engine=engine, jobs=jobs)
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+
+        self.lang = lang or locale.getlocale()[0]
+        if hyphenation == 'pyphen':
+            self.hyphen_cache = hyphen_cache if hyphen_cache is not None else hyphenation_mod.HyphenationCache()
+            hyphenator = justifier.make_hyphenator(self.lang, self.hyphen_cache, hyphen_dict_file)
+            self.lang = hyphenator.lang
+        else:
+            self.hyphen_cache = None
+            hyphenator = None
+
+        # Keyword args for justifier.reformat()
+        self.reformat_args = self.options.reformat_args(hyphenator)
+        self._reformat = justifier.select_reformat(self.reformat_args, engine)
+
+        self.jobs = jobs
+        self.batch_size = batch_size
+        self._executor = None   # concurrent.futures.ProcessPoolExecutor
+        self._lock = threading.Lock()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def close(self):
+        """
+        Shut down the worker processes, if any.
+        """
+
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown()
+                self._executor = None
+
+
+    def _get_executor(self):
+        from . import parallel
+
+        with self._lock:
+            if not self._executor:
+                self._executor = parallel.make_executor(self.jobs, self.reformat_args, self.lang,
+                                                        self.options.engine, self.options.hyphen_dict_file)
+            return self._executor
+
+
+    def _pipeline(self) -> utils.Pipeline:
+        if self.jobs > 1:
+            from . import parallel
+
+            reformat_stage = (parallel.parallel_reformat,
+                              {'executor': self._get_executor(), 'jobs': self.jobs, 'batch_size': self.batch_size})
+        else:
+            reformat_stage = (self._reformat, self.reformat_args)
+
+        return utils.Pipeline(justifier.get_paras, reformat_stage, utils.Collector)
+
+
+    def format_paras(self, paras: List[List[str]]) -> List[str]:
+        """
+        Reformat paragraphs that have already been split up, each a list of
+        lines, returning the formatted ones (i.e. those with any words) in
+        order.  With worker processes, this waits for one of them to do it.
+        """
+
+        if self.jobs > 1:
+            from . import parallel
+
+            return self._get_executor().submit(parallel.reformat_batch, paras).result()
+
+        p = utils.Pipeline((self._reformat, self.reformat_args), utils.Collector)
+        for para in paras:
+            p.send(para)
+        p.close()
+        return p.chain[-1].items
+
+
+    def justify_paras(self, lines: Iterable[str]) -> Iterator[str]:
+        """
+        Justify lines of text (with or without line endings) and yield each
+        paragraph as soon as it's complete, as a string of newline-separated
+        lines.
+        """
+
+        p = self._pipeline()
+        paras = p.chain[-1].items
+        for line in lines:
+            p.send(line.rstrip())
+            if paras:
+                yield from paras
+                paras.clear()
+
+        p.close()
+        yield from paras
+
+
+    def justify_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        """
+        Justify lines of text (with or without line endings) and yield the
+        output lines, without line endings and with an empty string between
+        paragraphs.
+        """
+
+        first = True
+        for para in self.justify_paras(lines):
+            if not first:
+                yield ""
+            yield from para.split("\n")
+            first = False
+
+
+    def justify(self, text: str) -> str:
+        """
+        Justify a block of text, returning it without a trailing newline.
+        """
+
+        return "\n\n".join(self.justify_paras(text.split("\n")))
+
+
+    def justify_many(self, texts: Iterable[str]) -> List[str]:
+        if self.jobs > 1:
+            from . import parallel
+
+            # Spread whole documents, rather than paragraphs, across the workers
+            texts = list(texts)
+            executor = self._get_executor()
+            futures = [executor.submit(parallel.justify_batch, texts[n:n + self.batch_size])
+                       for n in range(0, len(texts), self.batch_size)]
+            return [result for future in futures for result in future.result()]
+        else:
+            return [self.justify(text) for text in texts]
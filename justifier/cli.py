@@ -1,62 +1,264 @@
 """Console script for justifier."""
 
 from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, Callable, Generator, Type, Optional, TextIO, IO
+import os
 import sys
+import locale
 import logging
 
 import click
 
-from justifier import init_logging, params, __version__   # This package's top-level module
+from justifier import init_logging, __version__   # This package's top-level module
 from justifier import justifier
 from . import utils
 from . import context
+from . import hyphenation as hyphenation_mod
 
 
 @click.command(help="Justify the input, i.e. pad it to constant width using internal spaces")
 @click.option("--width", "-w", type=int, help="Width of text, not counting indent")
-@click.option("--indent", "-i", type=int, default=0, help="Number of spaces to add before text")
+@click.option("--indent", "-i", type=int, help="Number of spaces to add before text")
 @click.option("--right-margin", "-r", type=int, help="Indent plus width")
 @click.option("--centre/--no-centre", "-c", default=False, help="Automatically determine line width")
 @click.option("--center/--no-center", 'centre', help="Automatically determine line width")
 @click.option("--simple-hyphen", "-s", 'hyphenation', flag_value='simple', help="Hyphenation method")
-@click.option("--hyphen", "-h",        'hyphenation', flag_value='pyphen', default=True, help="Hyphenation method")
+@click.option("--hyphen", "-h",        'hyphenation', flag_value='pyphen', help="Hyphenation method")
 @click.option("--no-hyphenate", "-H",  'hyphenation', flag_value='none', help="Turn hyphenation off")
+@click.option("--hyphen-cache", type=click.Path(dir_okay=False), help="File in which to keep hyphenation points between runs")
+@click.option("--hyphen-cache-size", type=int, help="Maximum number of words in the hyphenation cache")
+@click.option("--hyphen-dict", type=click.Path(exists=True, dir_okay=False), help="Compiled hyphenation dictionary to use instead of pyphen's")
+@click.option("--skip-urls", is_flag=True, default=None, help="Don't hyphenate words that look like URLs, paths or identifiers")
+@click.option("--para-cache", type=click.Path(dir_okay=False), help="File in which to keep formatted paragraphs between runs (needs --seed)")
+@click.option("--optimal/--greedy", default=None, help="Choose line breaks for the whole paragraph at once")
+@click.option("--seed", type=int, help="Make padding reproducible, using the given random seed")
+@click.option("--output", "-o", type=click.Path(dir_okay=False, allow_dash=True), help="Write to a file instead of standard output")
+@click.option("--output-dir", "-O", type=click.Path(file_okay=False), help="Write each input to a file of the same name in this directory")
+@click.option("--files-from", type=click.File("r"), help="Read input file names from a file, one per line")
+@click.option("--stream", is_flag=True, help="Write each line as soon as it's ready, however long the paragraph")
+@click.option("--buffer-size", type=click.IntRange(min=1), help="Characters of output to collect before writing")
+@click.option("--jobs", "-j", type=click.IntRange(min=1), help="Number of worker processes")
+@click.option("--engine", type=click.Choice(justifier.ENGINES), help="How paragraphs are formatted")
+@click.option("--serve", is_flag=True, help="Run as a daemon that justifies text for --client")
+@click.option("--client", is_flag=True, help="Have a --serve daemon do the justifying")
+@click.option("--socket", "socket_path", type=click.Path(dir_okay=False), help="Socket for --serve and --client")
+@click.option("--stats", is_flag=True, help="Print a summary of where the time went to standard error")
 @click.option("--debug/--no-debug", "-d", default=False, help="Turn on debug mode")
-@click.argument("input", type=click.File(), default="-")
-def main(input: TextIO,
+@click.argument("inputs", nargs=-1, type=click.Path(dir_okay=False, allow_dash=True))
+def main(inputs: Tuple[str, ...],
          width: Optional[int], indent: Optional[int], right_margin: Optional[int],
-         centre: bool, hyphenation: str, debug: bool):
+         centre: bool, hyphenation: Optional[str], hyphen_cache: Optional[str], hyphen_cache_size: Optional[int], hyphen_dict: Optional[str],
+         skip_urls: Optional[bool], para_cache: Optional[str], optimal: Optional[bool], seed: Optional[int], output: Optional[str], output_dir: Optional[str], files_from: Optional[TextIO], stream: bool, buffer_size: Optional[int],
+         jobs: Optional[int], engine: Optional[str], serve: bool, client: bool, socket_path: Optional[str], stats: bool, debug: bool):
     """Console script for justifier."""
 
     master_logger = init_logging(loglevel=(debug and logging.DEBUG or logging.WARNING))
     logger = master_logger.getChild("cli")
 
     logger.debug("starting")
-    params['indent'] = indent
+    input_paths = list(inputs)
+    if files_from:
+        input_paths.extend(line.rstrip("\n") for line in files_from if line.strip())
+    if not input_paths and not files_from:
+        input_paths = ["-"]
+    line_width = None
     if width:
-        params['line_width'] = width
+        line_width = width
         # TO-DO: if centre: override indent = ((screen width) - width) / 2
         logger.debug("width = %d", width)
     elif centre:
         w = context.screen_width()
-        params['line_width'] = w - (2 * indent)
-        logger.debug("screen width = %d, calculated width = %d", w, params['line_width'])
+        line_width = w - (2 * (indent or 0))
+        logger.debug("screen width = %d, calculated width = %d", w, line_width)
     elif right_margin:
-        params['line_width'] = right_margin - indent
+        line_width = right_margin - (indent or 0)
 
-    params['hyphenation'] = hyphenation
+    # Settings that a daemon uses as defaults, or that a client sends;
+    # anything not given is left to the daemon, or to Options' defaults
+    shared = {'line_width': line_width, 'indent': indent, 'hyphenation': hyphenation, 'skip_urls': skip_urls,
+              'seed': seed, 'optimal': optimal}
+    shared = {k: v for k, v in shared.items() if v is not None}
+
+    if serve:
+        from . import server
+        try:
+            defaults = dict(shared)
+            if engine:
+                defaults['engine'] = engine
+            if hyphen_dict:
+                defaults['hyphen_dict_file'] = hyphen_dict
+            server.run_server(socket_path or server.default_socket_path(), defaults, hyphen_cache,
+                              hyphen_cache_size if hyphen_cache_size is not None else
+                              hyphenation_mod.DEFAULT_CACHE_SIZE)
+        except OSError as e:
+            raise click.ClickException(str(e))
+        return 0
+    elif client:
+        # These only affect how this process would do the justifying
+        local_only = {'--stream': stream, '--engine': engine, '--jobs': jobs, '--hyphen-cache': hyphen_cache,
+                      '--hyphen-cache-size': hyphen_cache_size, '--hyphen-dict': hyphen_dict,
+                      '--para-cache': para_cache, '--stats': stats, '--buffer-size': buffer_size}
+        for name, value in local_only.items():
+            if value is not None and value is not False:
+                raise click.UsageError("%s can't be used with --client" % name)
+        if output_dir:
+            check_output_dir(input_paths, output_dir, output)
+        elif output:
+            check_output_file(input_paths, output)
+        run_client(input_paths, shared, output, output_dir, socket_path)
+        return 0
+
+    local = {'engine': engine, 'buffer_size': buffer_size, 'jobs': jobs, 'hyphen_cache_size': hyphen_cache_size}
+    local = {k: v for k, v in local.items() if v is not None}
+    try:
+        options = justifier.Options(hyphen_cache_file=hyphen_cache, hyphen_dict_file=hyphen_dict, stream=stream, para_cache_file=para_cache,
+                                    output_file=output, stats=stats, **shared, **local)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    if output_dir:
+        check_output_dir(input_paths, output_dir, output)
+    elif output:
+        check_output_file(input_paths, output)
 
     utils.init(master_logger)
-    justifier.init(master_logger)
-    justifier.process(input)
-    ## for line in input:
-    ##     print(line)
-    ##     break
-    justifier.finalise()
+    try:
+        session = justifier.Session(options)
+    except ValueError as e:
+        # e.g. an engine that can't be used with the other options
+        raise click.UsageError(str(e))
+    except OSError as e:
+        raise click.FileError(e.filename or "", hint=e.strerror)
+    try:
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            session.process_files(input_paths, output_dir)
+        else:
+            # Everything goes through the one pipeline, one input after another
+            for path in input_paths:
+                if path == "-":
+                    session.process(sys.stdin.buffer)
+                else:
+                    with open(path, "rb") as input:
+                        session.process(input)
+        ## for line in input:
+        ##     print(line)
+        ##     break
+    except OSError as e:
+        raise click.FileError(e.filename or "", hint=e.strerror)
+    finally:
+        session.close()
 
     ## click.echo("See click documentation at https://click.palletsprojects.com/")
     return 0
 
 
+def run_client(input_paths: List[str], options: Dict, output: Optional[str], output_dir: Optional[str],
+               socket_path: Optional[str]):
+    """
+    Send each input to a daemon with the given options, writing the results
+    as main() would.
+    """
+
+    def read_text(path: str) -> str:
+        if path == "-":
+            data = sys.stdin.buffer.read()
+        else:
+            with open(path, "rb") as input:
+                data = input.read()
+        return data.decode(encoding)
+
+
+    def justify(text: str) -> bytes:
+        try:
+            result = server.request(text, options, socket_path)
+        except OSError as e:
+            raise click.ClickException("Can't reach the daemon at %s: %s" %
+                                       (socket_path or server.default_socket_path(), e.strerror or e))
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        except server.ProtocolError as e:
+            # e.g. the daemon stopped part way through
+            raise click.ClickException("Bad reply from the daemon: %s" % e)
+        return (result + "\n" if result else "").encode(encoding)
+
+
+    # -- run_client() --
+    from . import server
+    encoding = locale.getpreferredencoding(False)
+    try:
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            for path in input_paths:
+                result = justify(read_text(path))
+                with open(justifier.output_path_for(path, output_dir), "wb") as f:
+                    f.write(result)
+        else:
+            # Blank lines keep the inputs' paragraphs apart
+            result = justify("\n\n".join(read_text(path) for path in input_paths))
+            if output and output != "-":
+                with open(output, "wb") as f:
+                    f.write(result)
+            else:
+                sys.stdout.buffer.write(result)
+                sys.stdout.buffer.flush()
+    except OSError as e:
+        raise click.FileError(e.filename or "", hint=e.strerror)
+
+
+def check_output_dir(input_paths: List[str], output_dir: str, output: Optional[str]):
+    """
+    Make sure that each input has an output file of its own, which isn't the
+    input itself.
+    """
+
+    if output:
+        raise click.UsageError("--output and --output-dir can't be used together")
+
+    output_paths = set()
+    for path in input_paths:
+        if path == "-":
+            raise click.UsageError("Standard input can't be used with --output-dir")
+        output_path = justifier.output_path_for(path, output_dir)
+        if output_path in output_paths:
+            raise click.UsageError("More than one input would be written to %s" % output_path)
+        if os.path.abspath(output_path) == os.path.abspath(path):
+            raise click.UsageError("%s would be overwritten" % path)
+        output_paths.add(output_path)
+
+
+@click.command(help="Compile a hyphenation dictionary for --hyphen-dict, so that it loads quickly and can be shared")
+@click.option("--lang", "-l", help="Language of one of pyphen's dictionaries, or to record for --dic")
+@click.option("--dic", "dic_filename", type=click.Path(exists=True, dir_okay=False), help="Compile this hyph_*.dic file instead")
+@click.argument("output", type=click.Path(dir_okay=False))
+def compile_hyphen_dict(lang: Optional[str], dic_filename: Optional[str], output: str):
+    from . import hyphdict
+
+    if not lang and not dic_filename:
+        raise click.UsageError("Either --lang or --dic is needed")
+    try:
+        lang = hyphdict.compile_dict(output, lang, dic_filename)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    except OSError as e:
+        raise click.FileError(e.filename or output, hint=e.strerror)
+    click.echo("Compiled the '%s' dictionary into %s (%d bytes)" % (lang, output, os.path.getsize(output)))
+    return 0
+
+
+def check_output_file(input_paths: List[str], output: str):
+    """
+    Make sure that the output file isn't one of the inputs, which would be
+    truncated before it was read.
+    """
+
+    if output == "-":
+        return
+    for path in input_paths:
+        if path == "-":
+            continue
+        if os.path.abspath(output) == os.path.abspath(path) or \
+                (os.path.exists(output) and os.path.exists(path) and os.path.samefile(output, path)):
+            raise click.UsageError("%s would be overwritten" % path)
+
+
 if __name__ == "__main__":
     sys.exit(main())  # pragma: no cover
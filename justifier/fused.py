@@ -0,0 +1,113 @@
+"""
+Single-loop engine for the common configuration (greedy filling with the
+default separators), which gives the same output as justifier.reformat()
+without sending each word and line through a chain of coroutines.
+"""
+
+from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, Callable, Generator, Type, Optional, TextIO, IO
+import random
+
+from . import justifier
+from . import utils
+
+
+# *** FUNCTIONS ***
+def supports(options: Dict) -> bool:
+    """
+    Whether fused_reformat() can handle the given keyword args for
+    justifier.reformat().
+    """
+
+    return not options.get('optimal') and \
+           options.get('sep_regex', justifier.DEFAULT_SEP_REGEX) == justifier.DEFAULT_SEP_REGEX
+
+
+def fold_para(chunks: List[Tuple[str, str]], line_width: int, hypenate_fn: Optional[Callable],
+              rng: random.Random, prefix: str = "", stats: Optional[utils.Instrumentation] = None) -> List[str]:
+    """
+    Fill lines with chunks in the same way as justifier.create_folded_para().
+    @p stats: Counts hyphenation attempts and failures, and lines padded
+    """
+
+    min_fragment_len = justifier.min_fragment_length(line_width)
+
+    lines = []
+    line = justifier.LineBuffer()
+    line_len = 0   # Length not including separator after the final word
+    prevsep = ""
+    for word, sep in chunks:
+        if line_len + len(prevsep) + len(word) <= line_width:
+            line.append(word, sep)
+            line_len += len(prevsep) + len(word)
+            prevsep = sep
+            continue
+
+        # delta is number of spaces to be added to the line
+        delta = line_width - line_len
+        lfragment = ""
+        if hypenate_fn and delta - len(prevsep) >= min_fragment_len and len(word) >= min_fragment_len * 2:
+            if stats:
+                stats.counters['hyphenation_attempts'] += 1
+            try:
+                lfragment, rfragment = hypenate_fn(word, delta - len(prevsep))
+                line.append(lfragment, " ")
+                delta -= len(lfragment) + len(prevsep)
+            except ValueError:
+                lfragment = ""
+                if stats:
+                    stats.counters['hyphenation_failures'] += 1
+        if not lfragment:
+            rfragment = word
+
+        prevsep = sep
+        line_len = len(rfragment)
+
+        if line:
+            line.pad(delta, rng)
+            lines.append(line.render(prefix))
+            if stats:
+                stats.counters['lines_padded'] += 1
+
+        line.clear()
+        if rfragment:
+            line.append(rfragment, prevsep)
+
+    # The remaining partial line isn't padded
+    if line:
+        lines.append(line.render(prefix))
+
+    return lines
+
+
+def fused_reformat(dest: Generator, line_width: int = justifier.DEFAULT_LINE_WIDTH, indent: int = 0,
+                   hyphenation: str = 'pyphen', hyphenator=None, skip_urls: bool = False,
+                   sep_regex: str = justifier.DEFAULT_SEP_REGEX, seed: Optional[int] = None, optimal: bool = False,
+                   stats: Optional[utils.Instrumentation] = None):
+    """
+    Coroutine with the same interface and output as justifier.reformat(),
+    for the options that supports() accepts.
+    @p hyphenator: pyphen.Pyphen or equivalent; needed if `hyphenation` is 'pyphen'
+    @p stats: Counts paragraphs, words etc.; there are no stages to record
+    """
+
+    if not supports({'sep_regex': sep_regex, 'optimal': optimal}):
+        raise ValueError("The fused engine only does greedy filling with the default separators")
+
+    hypenate_fn = justifier.get_hypenate_fn(hyphenation, hyphenator, line_width, skip_urls)
+    prefix = " " * indent
+    rng = random.Random(seed)
+    try:
+        while True:
+            para = yield
+            if seed is not None:
+                rng.seed(seed)
+            chunks = justifier.tokenise(para)
+            lines = fold_para(chunks, line_width, hypenate_fn, rng, prefix, stats)
+            if stats:
+                stats.counters['paragraphs'] += 1
+                stats.counters['words'] += len(chunks)
+            if lines:
+                dest.send("\n".join(lines))
+
+    except GeneratorExit:
+        pass
@@ -0,0 +1,270 @@
+"""
+Hyphenation dictionaries compiled ahead of time into a trie held in flat
+arrays, which is memory-mapped read-only rather than parsed on every run.
+Opening one takes about as long as opening any file, and since the pages are
+mapped from the file, every process that uses it (e.g. worker processes)
+shares a single copy in memory.  Build one with:
+
+    python -m justifier.hyphdict --lang de_DE de_DE.hyd
+"""
+
+from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, Callable, Generator, Type, Optional, TextIO, IO
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from pathlib import Path
+from bisect import bisect_left
+
+
+# *** DEFINITIONS ***
+MAGIC = b"JHYD"
+FILE_VERSION = 1
+
+# Magic, version, whether the arrays are big-endian, then the numbers of
+# trie nodes and edges and the lengths in bytes of the values, the
+# nonstandard hyphenation data and the language name
+HEADER = struct.Struct("<4sHH5I")
+NO_VALUES = 0   # Offset in a node's values field for no pattern ending there
+
+
+# *** CLASSES ***
+class CompiledDict:
+    """
+    A hyphenation dictionary written by compile_dict(), giving exactly the
+    same hyphenation points as pyphen.Pyphen does for the dictionary it was
+    built from.  Provides the subset of the pyphen.Pyphen interface that's
+    used by this package, so it can be wrapped in a CachedHyphenator.
+
+    Patterns are looked up by walking a trie from each letter of the word;
+    the walk stops at the first letter that no pattern continues with, and
+    each step is a bisect of the node's edges, which are sorted by character.
+    Read-only, so safe to use from several threads at once.
+    """
+
+    def __init__(self, filename: str, left: int = 2, right: int = 2):
+        """
+        @p left: Minimum number of characters before a hyphenation point
+        @p right: Minimum number of characters after a hyphenation point
+        @raise ValueError: If `filename` isn't a compiled dictionary this version can read
+        """
+
+        self.filename = filename
+        self.left = left
+        self.right = right
+        with open(filename, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, big_endian, num_nodes, num_edges, values_len, alts_len, lang_len = \
+                HEADER.unpack_from(self._mmap)
+        except struct.error:
+            magic = version = None
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError("%s isn't a compiled hyphenation dictionary" % filename)
+        if version != FILE_VERSION:
+            self._mmap.close()
+            raise ValueError("Unsupported compiled hyphenation dictionary version in %s" % filename)
+
+        view = memoryview(self._mmap)
+        pos = HEADER.size
+        swap = bool(big_endian) != (sys.byteorder == 'big')
+
+        def section(length: int, fmt: str = 'B'):
+            nonlocal pos
+            data = view[pos:pos + length]
+            pos = align(pos + length)
+            if fmt == 'B':
+                return data
+            elif swap:
+                # Copied, so not shared with other processes
+                a = array(fmt, data)
+                a.byteswap()
+                return a
+            else:
+                return data.cast(fmt)
+
+
+        # -- __init__() --
+        item_size = array('I').itemsize
+        self._node_edges = section((num_nodes + 1) * item_size, 'I')   # First edge of each node, plus the end
+        self._node_values = section(num_nodes * item_size, 'I')   # Offset in _values, or NO_VALUES
+        self._edge_chars = section(num_edges * item_size, 'I')
+        self._edge_targets = section(num_edges * item_size, 'I')
+        # Each pattern's values: its start offset, the number of values, then the values
+        self._values = section(values_len)
+        # Nonstandard hyphenation (change, index, cut) for each value of the
+        # patterns that have it, keyed on the offset of their values
+        self._alts = {int(offset): [tuple(data) if data else None for data in alts]
+                      for offset, alts in json.loads(bytes(section(alts_len)).decode("utf-8")).items()}
+        self.lang = bytes(section(lang_len)).decode("utf-8")
+        self._views = [view, self._node_edges, self._node_values, self._edge_chars, self._edge_targets,
+                       self._values]
+
+
+    def close(self):
+        for v in reversed(self._views):
+            if isinstance(v, memoryview):
+                v.release()
+        self._mmap.close()
+
+
+    def positions(self, word: str) -> List[Tuple[int, Optional[Tuple[str, int, int]]]]:
+        """
+        Where `word` can be hyphenated, in ascending order, with the
+        nonstandard hyphenation data (if any) for each; the same as
+        pyphen.Pyphen.positions() except that the data isn't attached to
+        the position.
+        """
+
+        node_edges = self._node_edges
+        node_values = self._node_values
+        edge_chars = self._edge_chars
+        edge_targets = self._edge_targets
+        values = self._values
+
+        codes = [ord(c) for c in "." + word.lower() + "."]
+        references = [0] * (len(codes) + 1)
+        data = {}   # Dict[int, Tuple[str, int, int]]; nonstandard hyphenation at each reference
+        for i in range(len(codes) - 1):
+            node = 0
+            for j in range(i, len(codes)):
+                c = codes[j]
+                hi = node_edges[node + 1]
+                k = bisect_left(edge_chars, c, node_edges[node], hi)
+                if k == hi or edge_chars[k] != c:
+                    break
+                node = edge_targets[k]
+                offset = node_values[node]
+                if offset == NO_VALUES:
+                    continue
+
+                start = i + values[offset]
+                end = start + values[offset + 1]
+                pattern_values = values[offset + 2:offset + 2 + end - start]
+                alts = self._alts.get(offset)
+                if alts is None and not data:
+                    references[start:end] = map(max, pattern_values, references[start:end])
+                else:
+                    # As pyphen does, a pattern's value replaces an equal one
+                    # along with its data
+                    for n, value in enumerate(pattern_values):
+                        if value >= references[start + n]:
+                            references[start + n] = value
+                            if alts and alts[n]:
+                                data[start + n] = alts[n]
+                            else:
+                                data.pop(start + n, None)
+
+        right = len(word) - self.right
+        return [(n - 1, data.get(n)) for n, reference in enumerate(references)
+                if reference % 2 and self.left <= n - 1 <= right]
+
+
+    def iterate(self, word: str) -> Iterable[Tuple[str, str]]:
+        """
+        All (first part, last part) splits of `word`, longest first part
+        first, as pyphen.Pyphen.iterate() gives them.
+        """
+
+        for position, alt in reversed(self.positions(word)):
+            if alt:
+                change, index, cut = alt
+                index += position
+                if word.isupper():
+                    change = change.upper()
+                c1, c2 = change.split("=")
+                yield word[:index] + c1, c2 + word[index + cut:]
+            else:
+                yield word[:position], word[position:]
+
+
+
+# *** FUNCTIONS ***
+def align(pos: int) -> int:
+    return (pos + 3) & ~3
+
+
+def compile_dict(output_filename: str, lang: Optional[str] = None, dic_filename: Optional[str] = None) -> str:
+    """
+    Compile one of pyphen's dictionaries, or a hyph_*.dic file in the same
+    format, into `output_filename`.  Needs pyphen, which parses the patterns.
+    Returns the language name recorded in the file, which is `lang` if given.
+    """
+
+    import pyphen
+
+    if dic_filename:
+        path = Path(dic_filename)
+        if not lang:
+            lang = os.path.splitext(os.path.basename(dic_filename))[0]
+            if lang.startswith("hyph_"):
+                lang = lang[5:]
+    else:
+        name = pyphen.language_fallback(lang or "")
+        if not name:
+            raise ValueError("No hyphenation dictionary for '%s'" % lang)
+        path = pyphen.LANGUAGES[name]
+    patterns = pyphen.HyphDict(path).patterns
+
+    # Build the trie as nested dicts, then number the nodes breadth first so
+    # that each node's edges are contiguous
+    root = {}
+    ends = {}   # Dict[int, Tuple]; pattern (start, values) ending at each node, keyed on id()
+    for key, pattern in patterns.items():
+        node = root
+        for c in key:
+            node = node.setdefault(c, {})
+        ends[id(node)] = pattern
+
+    node_edges = array('I', [0])
+    node_values = array('I')
+    edge_chars = array('I')
+    edge_targets = array('I')
+    values = bytearray(b"\0")   # So that no pattern's offset is NO_VALUES
+    alts = {}   # Dict[str, List]
+    offsets = {}   # Dict[Tuple, int]; for sharing identical values
+    queue = [root]
+    for node in queue:
+        for c in sorted(node):
+            edge_chars.append(ord(c))
+            edge_targets.append(len(queue))
+            queue.append(node[c])
+        node_edges.append(len(edge_chars))
+
+        pattern = ends.get(id(node))
+        if pattern:
+            start, pattern_values = pattern
+            pattern_alts = [getattr(value, 'data', None) for value in pattern_values]
+            share_key = (start, tuple(pattern_values), tuple(pattern_alts))
+            offset = offsets.get(share_key)
+            if offset is None:
+                offset = offsets[share_key] = len(values)
+                values += bytes([start, len(pattern_values)]) + bytes(pattern_values)
+                if any(pattern_alts):
+                    alts[str(offset)] = [list(data) if data else None for data in pattern_alts]
+            node_values.append(offset)
+        else:
+            node_values.append(NO_VALUES)
+
+    sections = [node_edges.tobytes(), node_values.tobytes(), edge_chars.tobytes(), edge_targets.tobytes(),
+                bytes(values), json.dumps(alts).encode("utf-8"), lang.encode("utf-8")]
+    tmp_filename = output_filename + ".tmp"
+    with open(tmp_filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FILE_VERSION, sys.byteorder == 'big', len(node_values), len(edge_chars),
+                            len(values), len(sections[5]), len(sections[6])))
+        pos = HEADER.size
+        for data in sections:
+            f.write(data)
+            f.write(bytes(align(pos + len(data)) - pos - len(data)))
+            pos = align(pos + len(data))
+    os.replace(tmp_filename, output_filename)
+    return lang
+
+
+if __name__ == "__main__":
+    from justifier.cli import compile_hyphen_dict
+    sys.exit(compile_hyphen_dict())
@@ -0,0 +1,214 @@
+"""
+Hyphenation helpers, including a memoising cache of hyphenation points.
+"""
+
+from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, Callable, Generator, Type, Optional, TextIO, IO
+import os
+import json
+import bisect
+import threading
+from collections import OrderedDict
+
+
+# *** DEFINITIONS ***
+DEFAULT_CACHE_SIZE = 65536
+CACHE_FILE_VERSION = 1
+
+# Cache entry: the length of the first part of each split (ascending), plus
+# the splits themselves or None if they are all simple cuts of the word
+Entry = Tuple[Tuple[int, ...], Optional[Tuple[Tuple[str, str], ...]]]
+
+
+# *** CLASSES ***
+class HyphenationCache:
+    """
+    Store all legal break positions of each word, keyed on (language, word),
+    so the hyphenation dictionary is only walked once per word.  Lookups for
+    any width are answered with a bisect.
+
+    The number of words held is bounded; the least recently used entry is
+    evicted first.  The cache can be saved to and loaded from disk so that
+    warm runs don't need the dictionary at all.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # OrderedDict[Tuple[str, str], Entry]
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def lookup(self, lang: str, word: str, hyphenator) -> Entry:
+        """
+        Return the cache entry for `word`, computing it with `hyphenator` (a
+        pyphen.Pyphen or equivalent) if necessary.
+        """
+
+        key = (lang, word)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = make_entry(word, reversed(list(hyphenator.iterate(word))))
+        self._store(key, entry)
+        return entry
+
+
+    def _store(self, key: Tuple[str, str], entry: Entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+    def save(self, filename: str):
+        """
+        Write the cache to `filename` in least-recently-used order, so that
+        loading it preserves recency.  Simple splits are stored as positions.
+        """
+
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            json.dump(self.dump(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_filename, filename)
+
+
+    def load(self, filename: str):
+        """
+        Merge entries from a file written by save().
+        """
+
+        with open(filename, encoding="utf-8") as f:
+            data = json.load(f)
+        try:
+            self.merge(data)
+        except ValueError:
+            raise ValueError("Unsupported hyphenation cache version in %s" % filename)
+
+
+    def dump(self) -> Dict:
+        """
+        The cache's contents as JSON-compatible data, as written by save().
+        """
+
+        langs = {}   # Dict[str, Dict[str, list]]
+        with self._lock:
+            for (lang, word), (lengths, splits) in self._entries.items():
+                langs.setdefault(lang, {})[word] = list(lengths) if splits is None else [list(s) for s in splits]
+        return {'version': CACHE_FILE_VERSION, 'langs': langs}
+
+
+    def merge(self, data: Dict):
+        """
+        Add entries from the output of dump().
+        """
+
+        if data.get('version') != CACHE_FILE_VERSION:
+            raise ValueError("Unsupported hyphenation cache version")
+
+        for lang, words in data['langs'].items():
+            for word, stored in words.items():
+                if stored and isinstance(stored[0], list):
+                    entry = make_entry(word, [tuple(s) for s in stored])
+                else:
+                    entry = (tuple(stored), None)
+                self._store((lang, word), entry)
+
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class LazyPyphen:
+    """
+    Stands in for a pyphen.Pyphen object, which is only created (and pyphen
+    and its dictionary only loaded) when a word is first hyphenated, so runs
+    that never need it, or get everything from the cache, don't pay for it.
+    """
+
+    def __init__(self, lang: str):
+        self.lang = lang
+        self._pyphen = None   # pyphen.Pyphen
+
+
+    def iterate(self, word: str) -> Iterable[Tuple[str, str]]:
+        if self._pyphen is None:
+            import pyphen
+            self._pyphen = pyphen.Pyphen(lang=self.lang)
+        return self._pyphen.iterate(word)
+
+
+
+class CachedHyphenator:
+    """
+    Wraps a pyphen.Pyphen object (or equivalent) for a given language so that
+    its results come from a HyphenationCache.  Provides the subset of the
+    pyphen.Pyphen interface that's used by this package.
+    """
+
+    def __init__(self, hyphenator, lang: str, cache: HyphenationCache):
+        self.hyphenator = hyphenator
+        self.lang = lang
+        self.cache = cache
+
+
+    def splits(self, word: str) -> List[Tuple[str, str]]:
+        """
+        All possible (first part, last part) splits of `word`, shortest first
+        part first; no hyphen is attached.
+        """
+
+        lengths, splits = self.cache.lookup(self.lang, word, self.hyphenator)
+        if splits is None:
+            return [(word[:n], word[n:]) for n in lengths]
+        else:
+            return list(splits)
+
+
+    def wrap(self, word: str, width: int, hyphen: str = '-') -> Optional[Tuple[str, str]]:
+        """
+        Get the longest possible first part (with `hyphen` attached) that is
+        no longer than `width`, and the last part of the word.
+
+        Returns None if there is no such hyphenation point.
+        """
+
+        lengths, splits = self.cache.lookup(self.lang, word, self.hyphenator)
+        i = bisect.bisect_right(lengths, width - len(hyphen))
+        if i == 0:
+            return None
+        elif splits is None:
+            n = lengths[i - 1]
+            return word[:n] + hyphen, word[n:]
+        else:
+            lfragment, rfragment = splits[i - 1]
+            return lfragment + hyphen, rfragment
+
+
+
+# *** FUNCTIONS ***
+def make_entry(word: str, splits: Iterable[Tuple[str, str]]) -> Entry:
+    """
+    Build a cache entry from (first part, last part) splits in order of
+    hyphenation position, i.e. the reverse of pyphen.Pyphen.iterate().
+    """
+
+    splits = sorted(splits, key=lambda s: len(s[0]))
+    lengths = tuple(len(s[0]) for s in splits)
+    if all(lfragment + rfragment == word for lfragment, rfragment in splits):
+        return lengths, None
+    else:
+        return lengths, tuple(splits)
@@ -1,277 +1,817 @@
 """Main module."""
 
-from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, Callable, Generator, Type, Optional, TextIO, IO
+from typing import Set, Dict, Sequence, MutableSequence, Tuple, List, Union, AnyStr, Iterable, Callable, Generator, Type, Optional, TextIO, IO, Pattern
+import os
+import io
+import sys
 import re
 import logging
 from collections import namedtuple
+from array import array
 import random
 import locale
+import math
+from functools import partial
 
-import pyphen
-
-import justifier   # This package's top-level module
 from . import utils
+from . import hyphenation
 
 
 # *** DEFINITIONS ***
-logger = None   # logging.Logger
-pyphen_hyphenator = None   # pyphen.Pyphen
-p = None  # Pipeline
+DEFAULT_LINE_WIDTH = 60
+DEFAULT_SEP_REGEX = r"\s"
+SENTENCE_ENDINGS = (".", "!", "?")
+DEFAULT_BUFFER_SIZE = 256 * 1024
+DEFAULT_BATCH_SIZE = 64   # Paragraphs sent to a worker process at a time
+ENGINES = ('auto', 'fused', 'pipeline', 'numpy')
+# Equivalent to make_word_regex(DEFAULT_SEP_REGEX), without a lookahead at
+# every character
+WORD_REGEX = re.compile(r"(\S+)(\s*)")
+
+HYPHENATION_METHODS = ('pyphen', 'simple', 'none')
+# Words that look like URLs, e-mail addresses, paths or identifiers
+# (snake_case, camelCase, dotted.names), which `skip_urls` leaves whole
+URL_LIKE_REGEX = re.compile(r"[A-Za-z][\w+.-]*://|www\.|@\w|[/\\_]|[a-z][A-Z]|[A-Za-z]\.[A-Za-z]{2}")
+
+logger = logging.getLogger("justifier")
 
 
 # *** CLASSES ***
 Chunk = namedtuple('Chunk', ['word', 'sep'])
 
 
+class Options(namedtuple('Options', ['line_width', 'indent', 'hyphenation', 'lang', 'hyphen_cache_file',
+                                     'hyphen_cache_size', 'hyphen_dict_file', 'skip_urls', 'sep_regex', 'seed',
+                                     'optimal', 'engine', 'stream', 'para_cache_file', 'output_file', 'buffer_size',
+                                     'block_size', 'jobs', 'stats'])):
+    """
+    Settings for a Session, checked once when created.  Being immutable, an
+    Options can be shared between threads; use _replace() for a modified copy.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, line_width: int = DEFAULT_LINE_WIDTH, indent: int = 0, hyphenation: str = 'pyphen',
+                lang: Optional[str] = None, hyphen_cache_file: Optional[str] = None,
+                hyphen_cache_size: int = hyphenation.DEFAULT_CACHE_SIZE, hyphen_dict_file: Optional[str] = None,
+                skip_urls: bool = False, sep_regex: str = DEFAULT_SEP_REGEX, seed: Optional[int] = None,
+                optimal: bool = False, engine: str = 'auto', stream: bool = False, para_cache_file: Optional[str] = None,
+                output_file: Optional[str] = None, buffer_size: int = DEFAULT_BUFFER_SIZE,
+                block_size: int = utils.DEFAULT_BLOCK_SIZE, jobs: int = 1, stats: bool = False):
+        """
+        @p lang: Language for pyphen, defaulting to the current locale's
+        @p hyphen_dict_file: Compiled dictionary (see hyphdict) to use instead
+                             of pyphen's; `lang` is then ignored
+        @p skip_urls: Don't hyphenate words that look like URLs or identifiers
+        @p output_file: None or "-" for standard output
+        @p stats: Record where the time goes; see utils.Instrumentation
+        @raise ValueError: If any are invalid or they can't be used together
+        """
+
+        if line_width < 1:
+            raise ValueError("Line width must be at least 1")
+        if indent < 0:
+            raise ValueError("Indent can't be negative")
+        if hyphenation not in HYPHENATION_METHODS:
+            raise ValueError("Unknown hyphenation method '%s'" % hyphenation)
+        if engine not in ENGINES:
+            raise ValueError("Unknown engine '%s'" % engine)
+        if min(hyphen_cache_size, buffer_size, block_size, jobs) < 1:
+            raise ValueError("Cache, buffer and block sizes and number of jobs must be at least 1")
+        try:
+            re.compile(sep_regex)
+        except re.error as e:
+            raise ValueError("Invalid separator regex: %s" % e)
+        if para_cache_file and seed is None:
+            raise ValueError("The paragraph cache needs a seed, so that cached paragraphs match reformatted ones")
+        if para_cache_file and jobs > 1:
+            raise ValueError("The paragraph cache can't be used with worker processes")
+        if hyphen_cache_file and jobs > 1:
+            # Each worker has a cache of its own
+            raise ValueError("The hyphenation cache file can't be used with worker processes")
+        if hyphen_dict_file and hyphenation != 'pyphen':
+            raise ValueError("A compiled hyphenation dictionary is only used for pyphen hyphenation")
+        if stream and (optimal or para_cache_file or jobs > 1 or engine not in ('auto', 'pipeline')):
+            raise ValueError("Streaming can't be used with optimal filling, the paragraph cache, "
+                             "worker processes or the fused or numpy engines")
+
+        return super().__new__(cls, line_width, indent, hyphenation, lang, hyphen_cache_file, hyphen_cache_size,
+                               hyphen_dict_file, skip_urls, sep_regex, seed, optimal, engine, stream, para_cache_file,
+                               output_file, buffer_size, block_size, jobs, stats)
+
+
+    def _replace(self, **changes) -> 'Options':
+        # namedtuple's version skips the checks in __new__()
+        return Options(**dict(self._asdict(), **changes))
+
+
+    def reformat_args(self, hyphenator=None, stats: Optional[utils.Instrumentation] = None) -> Dict:
+        """
+        Keyword args for reformat() and its equivalents.
+        @p hyphenator: Needed if `hyphenation` is 'pyphen'
+        """
+
+        return {'line_width': self.line_width,
+                'indent': self.indent,
+                'hyphenation': self.hyphenation,
+                'hyphenator': hyphenator,
+                'skip_urls': self.skip_urls,
+                'sep_regex': self.sep_regex,
+                'seed': self.seed,
+                'optimal': self.optimal,
+                'stats': stats}
+
+
+class LineBuffer:
+    """
+    The line being filled: its words, the separator after each and the
+    padding for each gap, held in parallel.  One buffer is cleared and
+    reused for every line.
+    """
+
+    __slots__ = ('words', 'seps', 'padding')
+
+    def __init__(self):
+        self.words = []   # List[str]
+        self.seps = []    # List[str]
+        self.padding = array('I')   # Extra spaces after each word but the last
+
+
+    def __len__(self):
+        return len(self.words)
+
+
+    def append(self, word: str, sep: str):
+        self.words.append(word)
+        self.seps.append(sep)
+
+
+    def extend(self, words: List[str], seps: List[str], start: int, end: int):
+        """
+        Append words `start` to `end` of `words`, and their separators.
+        """
+
+        self.words += words[start:end]
+        self.seps += seps[start:end]
+
+
+    def clear(self):
+        del self.words[:]
+        del self.seps[:]
+        del self.padding[:]
+
+
+    def pad(self, delta: int, rng: random.Random, sentence_end_gaps: Optional[Sequence[int]] = None):
+        """
+        Work out the padding for a line that's `delta` characters short; see
+        distribute_padding().
+        @p sentence_end_gaps: If already known; otherwise the words are checked
+        """
+
+        words = self.words
+        num_gaps = len(words) - 1
+        if sentence_end_gaps is None:
+            sentence_end_gaps = [n for n in range(num_gaps) if words[n].endswith(SENTENCE_ENDINGS)]
+        distribute_padding(num_gaps, sentence_end_gaps, delta, rng, self.padding)
+
+
+    def render(self, prefix: str = "") -> str:
+        """
+        Join everything into a line, without the last separator; the padding
+        is included if pad() has been called since the last clear().
+        """
+
+        words = self.words
+        parts = [prefix] * (len(words) * 2)
+        parts[1::2] = words
+        if self.padding:
+            parts[2::2] = [sep + " " * extra for sep, extra in zip(self.seps, self.padding)]
+        else:
+            parts[2::2] = self.seps[:-1]
+
+        return "".join(parts)
+
+
+class Session:
+    """
+    A pipeline from any number of inputs to standard output or a file (or
+    from input files to a directory), as run by the command line.  All its
+    state is held here rather than in module globals, so sessions with
+    different options can be run at the same time in different threads.
+    """
+
+    def __init__(self, options: Options):
+        self.options = options
+        self.stats = utils.Instrumentation() if options.stats else None
+        self.hyphenation_cache = None   # hyphenation.HyphenationCache
+        self.para_cache = None   # paracache.ParagraphCache
+        self.executor = None   # concurrent.futures.Executor
+        self.output = None   # utils.LazyFile; output file, if not stdout
+
+        hyphenator = None
+        if options.hyphenation == 'pyphen':
+            self.hyphenation_cache = hyphenation.HyphenationCache(options.hyphen_cache_size)
+            if options.hyphen_cache_file and os.path.exists(options.hyphen_cache_file):
+                self.hyphenation_cache.load(options.hyphen_cache_file)
+            hyphenator = make_hyphenator(options.lang, self.hyphenation_cache, options.hyphen_dict_file)
+        reformat_args = options.reformat_args(hyphenator, self.stats)
+
+        if options.stream:
+            # Lines go through one at a time, however long the paragraphs are
+            self.reformat_stage = (stream_reformat, reformat_args)
+        elif options.jobs > 1:
+            # Paragraphs are reformatted by worker processes, each with its own hyphenator
+            from . import parallel
+            self.executor = parallel.make_executor(options.jobs, reformat_args, options.lang, options.engine,
+                                                   options.hyphen_dict_file)
+            self.reformat_stage = (parallel.parallel_reformat, {'executor': self.executor, 'jobs': options.jobs})
+        else:
+            # reformat() uses create_folded_para(), possibly indent_lines() and
+            # collate_lines() in a sub-pipeline; the fused engine does it all in one
+            self.reformat_stage = (select_reformat(reformat_args, options.engine), reformat_args)
+            if options.para_cache_file:
+                # Only paragraphs that aren't in the cache go through the stage above
+                from . import paracache
+                self.para_cache = paracache.ParagraphCache(options.para_cache_file, reformat_args,
+                                                           hyphenator.lang if hyphenator else options.lang,
+                                                           options.hyphen_dict_file)
+                self.reformat_stage = (paracache.cached_reformat,
+                                       {'cache': self.para_cache, 'reformat_fn': self.reformat_stage[0],
+                                        'options': reformat_args, 'stats': self.stats})
+
+        if options.output_file and options.output_file != "-":
+            # Not truncated until there's an input to justify
+            self.output = utils.LazyFile(options.output_file)
+        self.p = utils.Pipeline(get_para_lines if options.stream else get_paras, self.reformat_stage,
+                                (print_lines if options.stream else print_paras,
+                                 {'output': self.output, 'buffer_size': options.buffer_size}),
+                                instrumentation=self.stats)
+
+
+    def process(self, input: Union[IO[bytes], Iterable[str]]):
+        """
+        Justify a binary stream (which is read in large blocks) or an iterable
+        of lines.
+        """
+
+        if self.output:
+            self.output.open()
+        if isinstance(input, (io.RawIOBase, io.BufferedIOBase)):
+            self.p.send_all(utils.read_lines(input, block_size=self.options.block_size))
+        else:
+            self.p.send_lines(input)
+        # Don't run the last paragraph into the next input's first
+        self.p.send("")
+
+
+    def process_files(self, input_paths: Sequence[str], output_dir: str):
+        """
+        Justify each input file into a file of the same name in `output_dir`,
+        reusing this session's engine; with worker processes, whole files
+        are spread across them.
+        """
+
+        options = self.options
+        if self.executor:
+            from . import parallel
+            futures = [self.executor.submit(parallel.justify_file, path, output_path_for(path, output_dir),
+                                            options.buffer_size, options.block_size)
+                       for path in input_paths]
+            # Wait for them in order, so that the first error is raised
+            for future in futures:
+                future.result()
+        else:
+            for path in input_paths:
+                logger.debug("justifying %s", path)
+                justify_file(path, output_path_for(path, output_dir), self.reformat_stage, options.buffer_size,
+                             options.block_size, self.stats, options.stream)
+
+
+    def close(self):
+        """
+        Flush and close everything, print the statistics (if any) to
+        standard error and save the hyphenation cache (if wanted).
+        """
+
+        self.p.close()
+        if self.output:
+            self.output.close()
+        if self.executor:
+            self.executor.shutdown()
+        if self.para_cache:
+            self.para_cache.close()
+            summary = "paragraph cache: %d hits, %d misses (%.1f%% hit rate)" % \
+                      (self.para_cache.hits, self.para_cache.misses, self.para_cache.hit_rate() * 100)
+            logger.debug(summary)
+            if self.stats:
+                print(summary, file=sys.stderr)
+        if self.stats:
+            print(self.stats.summary(), file=sys.stderr)
+
+        if self.hyphenation_cache is not None:
+            logger.debug("hyphenation cache: %d hits, %d misses, %d words",
+                         self.hyphenation_cache.hits, self.hyphenation_cache.misses, len(self.hyphenation_cache))
+            if self.options.hyphen_cache_file:
+                self.hyphenation_cache.save(self.options.hyphen_cache_file)
+
+
 
 
 # *** FUNCTIONS ***
 def get_paras(dest: Generator):
     """
-    Coroutine that chunks lines into paragraphs
+    Coroutine that chunks lines into paragraphs, each of which is sent as a
+    list of lines (no joining is done, to avoid quadratic string building)
+    Receives either single lines or lists of lines.
     @p dest: Next generator object
     """
 
     logger.debug("get_paras started; %s", repr(dest))
 
     try:
-        data = None
+        lines = []
         while True:
             ## logger.debug("getting...")
-            line = yield
-            ## logger.debug("got %d chars", len(line))
-            if line:
-                if data is not None:
-                    data += " " + line
-                else:
-                    data = line
-            else:
-                # A blank line sends the collected paragraphs, if any
-                if data is not None:
-                    dest.send(data)
-                    data = None
+            batch = yield
+            if isinstance(batch, str):
+                batch = (batch,)
+            ## logger.debug("got %d lines", len(batch))
+            for line in batch:
+                if line:
+                    lines.append(line)
+                elif lines:
+                    # A blank line sends the collected paragraph, if any
+                    dest.send(lines)
+                    lines = []
 
     except GeneratorExit:
         pass
 
     finally:
         # Send the final collected paragraph, if any
-        if data is not None:
-            dest.send(data)
+        if lines:
+            dest.send(lines)
 
 
-def reformat(dest: Generator):
+def get_para_lines(dest: Generator):
     """
-    Receive a series of paragraphs and use a pair of create_folded_para() and
-    collate_lines() generators to handle each one.
+    Coroutine like get_paras() that sends each line of a paragraph as soon as
+    it's received, followed by None at the end of the paragraph, so that
+    paragraphs are never held in memory.
+    Receives either single lines or lists of lines.
+    @p dest: Next generator object
     """
 
-    def chunk_to_words(s: str, dest: Union[Generator, utils.Pipeline]):
-        logger.debug("chunk_to_words started; %s", repr(dest))
+    in_para = False
+    try:
+        while True:
+            batch = yield
+            if isinstance(batch, str):
+                batch = (batch,)
+            for line in batch:
+                if line:
+                    dest.send(line)
+                    in_para = True
+                elif in_para:
+                    dest.send(None)
+                    in_para = False
+
+    except GeneratorExit:
+        pass
+
+    finally:
+        if in_para:
+            dest.send(None)
 
-        # Do we need to chop the last separator?
-        for match in reo.finditer(para):
-            if match:
-                chunk = (match.group(1), match.group(2) or "")
-            else:
-                chunk = ("", "")
-            dest.send(chunk)
 
+def reformat(dest: Generator, line_width: int = DEFAULT_LINE_WIDTH, indent: int = 0,
+             hyphenation: str = 'pyphen', hyphenator=None, skip_urls: bool = False,
+             sep_regex: str = DEFAULT_SEP_REGEX, seed: Optional[int] = None, optimal: bool = False,
+             stats: Optional[utils.Instrumentation] = None):
+    """
+    Receive a series of paragraphs (each a list of lines), tokenise each
+    into a single batch of chunks and use a pair of create_folded_para() and
+    collate_lines() generators to handle them.
+    @p hyphenator: pyphen.Pyphen or equivalent; needed if `hyphenation` is 'pyphen'
+    @p skip_urls: Don't hyphenate words that look like URLs or identifiers
+    @p seed: Makes padding deterministic; see create_folded_para()
+    @p optimal: Use optimal.create_optimal_para() instead of create_folded_para()
+    @p stats: Records the sub-pipeline's stages and counts paragraphs, words etc.
+    """
 
-    # -- reformat() --
-    sep_regex = justifier.params.get('sep_regex', r"\s")
-    reo = re.compile("((?:(?!%s).)+)((?:%s)*)" % (sep_regex, sep_regex))
+    fold_options = {'line_width': line_width, 'hyphenation': hyphenation, 'hyphenator': hyphenator,
+                    'skip_urls': skip_urls, 'seed': seed, 'stats': stats}
+    if optimal:
+        from .optimal import create_optimal_para as fold_fn
+    else:
+        fold_fn = create_folded_para
+    reo = None if sep_regex == DEFAULT_SEP_REGEX else make_word_regex(sep_regex)
+
+    # Create a mini-pipeline that lasts for the whole run; each paragraph is
+    # terminated by sending None, which resets it
+    # (entities are created in reverse order)
+    if indent > 0:
+        p = utils.Pipeline((fold_fn, fold_options),
+                           (indent_lines, {'indent': indent}),
+                           (collate_lines, {'dest': dest}),
+                           instrumentation=stats)
+    else:
+        p = utils.Pipeline((fold_fn, fold_options),
+                           (collate_lines, {'dest': dest}),
+                           instrumentation=stats)
     try:
         while True:
             para = yield
             ## logger.debug(para)
 
-            # Fan-in to this generator's `dest`
-            coll = collate_lines(dest)
-            coll.send(None)
+            # Run the mini-pipeline
+            chunks = tokenise(para, reo)
+            if chunks:
+                p.send(chunks)
+            p.send(None)
+            if stats:
+                stats.counters['paragraphs'] += 1
+                stats.counters['words'] += len(chunks)
 
-            # Create a mini-pipeline just for this paragraph
-            # (entities are created in reverse order)
-            if justifier.params.get('indent') > 0:
-                p = utils.Pipeline(create_folded_para,
-                                   (indent_lines, {'indent': justifier.params['indent']}),
-                                   coll)
-            else:
-                p = utils.Pipeline(create_folded_para, coll)
+    except GeneratorExit:
+        pass
 
-            # Run the mini-pipeline
-            chunk_to_words(para, p)
+    finally:
+        # Clean up the mini-pipeline in forwards order
+        p.close()
+
+
+def stream_reformat(dest: Generator, line_width: int = DEFAULT_LINE_WIDTH, indent: int = 0,
+                    hyphenation: str = 'pyphen', hyphenator=None, skip_urls: bool = False,
+                    sep_regex: str = DEFAULT_SEP_REGEX, seed: Optional[int] = None, optimal: bool = False,
+                    stats: Optional[utils.Instrumentation] = None):
+    """
+    Coroutine with the same options and output as reformat(), but which
+    receives lines and Nones from get_para_lines() and sends each output
+    line to `dest` as soon as it's filled, with None after each paragraph,
+    instead of collating them.
+    Optimal filling needs the whole paragraph, so isn't supported.
+    """
 
-            # Clean up the mini-pipeline in forwards order
-            p.close()
+    if optimal:
+        raise ValueError("Optimal filling can't be streamed")
+
+    fold_options = {'line_width': line_width, 'hyphenation': hyphenation, 'hyphenator': hyphenator,
+                    'skip_urls': skip_urls, 'seed': seed, 'stats': stats}
+    reo = None if sep_regex == DEFAULT_SEP_REGEX else make_word_regex(sep_regex)
+    if indent > 0:
+        p = utils.Pipeline((create_folded_para, fold_options), (indent_lines, {'indent': indent, 'dest': dest}),
+                           instrumentation=stats)
+    else:
+        p = utils.Pipeline((create_folded_para, dict(fold_options, dest=dest)), instrumentation=stats)
+
+    # The last chunk of each line is held back, because its separator
+    # depends on how the next line starts; re-tokenising it along with the
+    # next line gives the same chunks as tokenising the whole paragraph would
+    tail = None
+    words = 0
+    try:
+        while True:
+            line = yield
+            if line is None:
+                if tail:
+                    p.send(tail)
+                    tail = None
+                p.send(None)
+                if stats:
+                    stats.counters['paragraphs'] += 1
+                    stats.counters['words'] += words
+                words = 0
+                continue
+
+            chunks = tokenise((tail[0] + tail[1], line) if tail else (line,), reo)
+            if chunks:
+                words += len(chunks) - (1 if tail else 0)
+                tail = chunks.pop()
+                if chunks:
+                    p.send(chunks)
 
     except GeneratorExit:
         pass
 
+    finally:
+        if tail:
+            p.send(tail)
+        p.close()
+
 
-def create_folded_para(dest: Generator):
+def tokenise(lines: Iterable[str], reo: Optional[Pattern] = None) -> List[Tuple[str, str]]:
+    """
+    Split a paragraph into (word, separator) tuples.  Each line break counts
+    as a single space, plus any separators at the start of the next line, as
+    if the lines had been joined.
+    @p reo: From make_word_regex(), or None for the default separators,
+            which are handled by a much faster equivalent regex
     """
-    Coroutine that formats a series of words into a paragraph.
+
+    chunks = []
+    if reo is None:
+        for line in lines:
+            tokens = WORD_REGEX.findall(line)
+            if chunks:
+                # Line break plus any leading separators on this line (or all
+                # of it, if it's nothing but separators)
+                word, sep = chunks[-1]
+                chunks[-1] = (word, sep + " " + (line[:len(line) - len(line.lstrip())] if tokens else line))
+            chunks.extend(tokens)
+    else:
+        for line in lines:
+            pos = 0
+            for match in reo.finditer(line):
+                if pos == 0 and chunks:
+                    word, sep = chunks[-1]
+                    chunks[-1] = (word, sep + " " + line[0:match.start()])
+                chunks.append((match.group(1), match.group(2) or ""))
+                pos = match.end()
+            if pos == 0 and chunks:
+                word, sep = chunks[-1]
+                chunks[-1] = (word, sep + " " + line)
+
+    return chunks
+
+
+def make_word_regex(sep_regex: str = DEFAULT_SEP_REGEX) -> Pattern:
+    """
+    Regex matching a word and the separators after it, as groups 1 and 2.
+    """
+
+    return re.compile("((?:(?!%s).)+)((?:%s)*)" % (sep_regex, sep_regex))
+
+
+def select_reformat(options: Dict, engine: str = 'auto') -> Callable:
+    """
+    Choose the coroutine to reformat paragraphs with, given keyword args for
+    reformat(): 'pipeline' is reformat() itself, 'fused' is
+    fused.fused_reformat(), 'numpy' is vectorised.numpy_reformat() (if NumPy
+    is installed) and 'auto' picks fused if it can handle the options.
+    """
+
+    from . import fused
+
+    if engine == 'pipeline':
+        return reformat
+    elif engine == 'fused':
+        if not fused.supports(options):
+            raise ValueError("The fused engine can't be used with these options")
+        return fused.fused_reformat
+    elif engine == 'numpy':
+        try:
+            from . import vectorised
+        except ImportError:
+            raise ValueError("The numpy engine needs NumPy to be installed")
+        if not vectorised.supports(options):
+            raise ValueError("The numpy engine can't be used with these options")
+        return vectorised.numpy_reformat
+    elif engine == 'auto':
+        return fused.fused_reformat if fused.supports(options) else reformat
+    else:
+        raise ValueError("Unknown engine '%s'" % engine)
+
+
+def create_folded_para(dest: Generator, line_width: int = DEFAULT_LINE_WIDTH,
+                       hyphenation: str = 'pyphen', hyphenator=None, skip_urls: bool = False,
+                       seed: Optional[int] = None, stats: Optional[utils.Instrumentation] = None):
+    """
+    Coroutine that formats a series of (word, separator) tuples, or lists of
+    them, into lines.  A None marks the end of a paragraph and is passed on to `dest` after the
+    paragraph's last line.
     @p dest: Next generator object
+    @p hyphenator: pyphen.Pyphen or equivalent; needed if `hyphenation` is 'pyphen'
+    @p skip_urls: Don't hyphenate words that look like URLs or identifiers
+    @p seed: If given, padding is pseudo-random but the same every time a
+             given paragraph is formatted with the same options
+    @p stats: Counts hyphenation attempts and failures, and lines padded
 
     @warning Not a main-chain generator, so do NOT close `dest`.
     """
 
-    def line_render(a: List[Chunk]) -> str:
-        """
-        Join all chunks (word and separator) together into a line, without the
-        last separator.
-        """
+    hypenate_fn = get_hypenate_fn(hyphenation, hyphenator, line_width, skip_urls)
+    min_fragment_len = min_fragment_length(line_width)
+    rng = random.Random(seed)
+    line = LineBuffer()
+    line_len = 0   # Length not including separator after the final word
+    prevsep = ""
+    try:
+        # Build a line out of chunk-tuples then render it to a string
+        while True:
+            batch = yield
+            if batch is None:
+                # End of paragraph: send the remaining partial line without
+                # doing anything to it, then reset for the next paragraph
+                if line:
+                    dest.send(line.render())
+                dest.send(None)
+                line.clear()
+                line_len = 0
+                prevsep = ""
+                if seed is not None:
+                    rng.seed(seed)
+                continue
+            elif isinstance(batch, tuple):
+                batch = (batch,)
 
-        # Remove the spaces after the final word, if any
-        if a[-1].sep:
-            new_chunk = Chunk(a[-1].word, "")
+            # Pull enough words to completely fill a line
+            for word, sep in batch:
+                if line_len + len(prevsep) + len(word) <= line_width:
+                    line.append(word, sep)
+                    line_len += len(prevsep) + len(word)
+                    prevsep = sep
+                    continue
+
+                # delta is number of spaces to be added to the line
+                delta = line_width - line_len
+                # (Try to) split the word
+                if hypenate_fn and delta-len(prevsep) >= min_fragment_len and \
+                        len(word) >= min_fragment_len * 2:
+                    if stats:
+                        stats.counters['hyphenation_attempts'] += 1
+                    try:
+                        # If we add a fragment to this line, separator won't be at
+                        # the end any more and so will count against the delta
+                        lfragment, rfragment = hypenate_fn(word, delta - len(prevsep))
+
+                        # Hyphenation succeeded
+                        line.append(lfragment, " ")
+                        delta -= len(lfragment) + len(prevsep)
+                    except ValueError:
+                        lfragment = ""
+                        if stats:
+                            stats.counters['hyphenation_failures'] += 1
+                else:
+                    logger.debug("not hyphenating; delta is %d for line_len %d of %d words (prevsep %s sep %s)",
+                                 delta, line_len, len(line), prevsep, sep)
+                    lfragment = ""
 
-        return "".join(c.word + c.sep for c in a)
+                if not lfragment:
+                    # No fragment added to this line; whole word is carried over to
+                    # the next line and so delta includes width of prevsep
+                    rfragment = word
+
+                # Seed the next iteration
+                prevsep = sep
+                line_len = len(rfragment)
+
+                # Pad and send the finished line (there's nothing to send if the
+                # first word was too long to fit and couldn't be hyphenated)
+                # (Initially, this is done with simple spaces but should use a
+                # selection of weighted tweaks instead)
+                if line:
+                    line.pad(delta, rng)
+                    dest.send(line.render())
+                    if stats:
+                        stats.counters['lines_padded'] += 1
+
+                # Text to be prepended to the next line
+                line.clear()
+                if rfragment:
+                    line.append(rfragment, prevsep)
 
+    except GeneratorExit:
+        pass
 
-    def simple_hypenate(word: str, delta: int) -> Tuple[str, str]:
-        lfragment = word
-        rfragment = ""
+    finally:
+        # Just print the remaining partial line without doing anything to it
+        if line:
+            dest.send(line.render())
 
-        # Reduce the lfragment length by one each iteration
-        while len(lfragment) > delta:
-            lfragment = word[0:len(lfragment)-2] + "-"
-            rfragment = word[len(lfragment)-1:]   # len(lfragment) changed prev line
-        logger.debug("delta is %d for line_len %d (lfragment %s prevsep %s sep %s)",
-                        delta, line_len, lfragment, prevsep, sep)
 
-        return lfragment, rfragment
+def simple_hypenate(word: str, delta: int, min_fragment_len: int = 1) -> Tuple[str, str]:
+    """
+    Split `word` anywhere so that the first part, which has a hyphen added,
+    is no longer than `delta`, leaving at least `min_fragment_len`
+    characters in each part (not counting the hyphen).
+    @raise ValueError: If there's no such split
+    """
+
+    if len(word) <= delta:
+        return word, ""
+
+    # As much as fits with the hyphen, unless that leaves too little after it
+    n = min(delta - 1, len(word) - min_fragment_len)
+    if n < min_fragment_len:
+        raise ValueError("Unhyphenatable word '%s'" % word, word)
+    return word[:n] + "-", word[n:]
+
+
+def min_fragment_length(line_width: int) -> float:
+    """
+    The shortest part of a word that's worth hyphenating it for, i.e. one
+    extra space per 20 characters, up to 3.
+    """
+
+    return min(3, line_width / 20)
+
 
+def get_hypenate_fn(hyphenation: str, hyphenator=None, line_width: Optional[int] = None,
+                    skip_urls: bool = False) -> Optional[Callable[[str, int], Tuple[str, str]]]:
+    """
+    Return the function that splits a word for the given hyphenation method
+    ('simple', 'pyphen' or 'none', for which None is returned).  The function
+    takes the word and the maximum length of the first part, and raises
+    ValueError if the word can't be split.
+    @p hyphenator: pyphen.Pyphen or equivalent; needed if `hyphenation` is 'pyphen'
+    @p line_width: If given, 'simple' leaves at least min_fragment_length()
+                   characters in each part
+    @p skip_urls: Don't split words that match URL_LIKE_REGEX
+    """
 
     def pyphen_hypenate(word: str, delta: int) -> Tuple[str, str]:
         # Returns either a 2-tuple or None
-        result = pyphen_hyphenator.wrap(word, delta)
+        result = hyphenator.wrap(word, delta)
         if result:
             lfragment, rfragment = result
-            logger.debug("delta is %d for line_len %d (lfragment %s prevsep %s sep %s)",
-                         delta, line_len, lfragment, prevsep, sep)
+            logger.debug("delta is %d (lfragment %s rfragment %s)", delta, lfragment, rfragment)
             return lfragment, rfragment
         else:
-            logger.debug("'%s' isn't hyphenatable; delta is %d for line_len %d (prevsep %s sep %s)",
-                         word, delta, line_len, prevsep, sep)
+            logger.debug("'%s' isn't hyphenatable; delta is %d", word, delta)
             raise ValueError("Unhyphenatable word '%s'" % word, word)
 
 
-    # -- create_folded_para() --
-    hypenate_fn = {'simple': simple_hypenate, 'pyphen': pyphen_hypenate, 'none': None}[justifier.params.get('hyphenation', 'pyphen')]
-    line_width = justifier.params.get('line_width', 60)
-    min_fragment_len = min(3, line_width / 20)
-    line_chunks = []  # List[Chunk]
-    try:
-        line_len = 0   # Length not including separator part of final Chunk
-        prevsep = ""
-        # Build a line out of chunk-tuples then render it to a string
-        while True:
-            # Pull enough words to completely fill a line
-            while True:
-                word, sep = yield
-                if line_len + len(prevsep) + len(word) <= line_width:
-                    line_chunks.append(Chunk(word, sep))
-                    line_len += len(prevsep) + len(word)
-                    prevsep = sep
-                else:
-                    break
-
-            # delta is number of spaces to be added to the line
-            delta = line_width - line_len
-            # (Try to) split the word
-            if hypenate_fn and delta-len(prevsep) >= min_fragment_len and \
-                    len(word) >= min_fragment_len * 2:
-                try:
-                    # If we add a fragment to this line, separator won't be at
-                    # the end any more and so will count against the delta
-                    lfragment, rfragment = hypenate_fn(word, delta - len(prevsep))
-
-                    # Hyphenation succeeded
-                    line_chunks.append(Chunk(lfragment, " "))
-                    delta -= len(lfragment) + len(prevsep)
-                except ValueError:
-                    lfragment = ""
-            else:
-                logger.debug("not hyphenating; delta is %d for line_len %d of %d words (prevsep %s sep %s)",
-                             delta, line_len, len(line_chunks), prevsep, sep)
-                lfragment = ""
-
-            if not lfragment:
-                # No fragment added to this line; whole word is carried over to
-                # the next line and so delta includes width of prevsep
-                rfragment = word
-
-            # Seed the next iteration
-            prevsep = sep
-            line_len = len(rfragment)
-
-            # Pad the partial line
-            num_words = len(line_chunks)
-            # (Initially, this is done with simple spaces but should use a
-            # selection of weighted tweaks instead)
-            while delta > 0:
-                # First, pick words that end with "." etc. -- count might be > delta
-                ## sentence_end_pred()
-                sentence_end_wordnums = [n for n in range(num_words - 1) if line_chunks[n].word.endswith((".", "!", "?"))]
-                # Then just pick random words
-                if num_words > 1 and delta > len(sentence_end_wordnums):
-                    sample_count = min(num_words - 1, delta - len(sentence_end_wordnums))
-                    random_wordnums = random.sample(range(num_words - 1), sample_count)
-                else:
-                    # Slice the array if not all needed
-                    if len(sentence_end_wordnums) > delta:
-                        sentence_end_wordnums = sentence_end_wordnums[0:delta]
+    def skip_urls_hypenate(word: str, delta: int) -> Tuple[str, str]:
+        if URL_LIKE_REGEX.search(word):
+            raise ValueError("Not hyphenating '%s'" % word, word)
+        return hypenate_fn(word, delta)
 
-                    random_wordnums = []
 
-                all_wordnums = sentence_end_wordnums + random_wordnums
-                if all_wordnums:
-                    delta -= len(all_wordnums)
+    # -- get_hypenate_fn() --
+    if hyphenation == 'simple' and line_width is not None:
+        hypenate_fn = partial(simple_hypenate, min_fragment_len=math.ceil(min_fragment_length(line_width)))
+    else:
+        hypenate_fn = {'simple': simple_hypenate, 'pyphen': pyphen_hypenate, 'none': None}[hyphenation]
+    return skip_urls_hypenate if hypenate_fn and skip_urls else hypenate_fn
 
-                    # Pad chunks with given numbers
-                    ## logger.debug("Padding %d for line ending %s", delta, lfragment)
-                    for n in all_wordnums:
-                        new_chunk = Chunk(line_chunks[n].word, line_chunks[n].sep + " ")
-                        line_chunks[n] = new_chunk
-                else:
-                    # Give up iterating if no padding opportunities were found
-                    break
 
-            # Send the finished line
-            dest.send(line_render(line_chunks))
+def render_line(a: List[Chunk], padding: Optional[List[int]] = None) -> str:
+    """
+    Join all chunks (word and separator, plus any padding for that gap)
+    together into a line, without the last separator.
+    """
+
+    if padding:
+        parts = [c.word + c.sep + " " * extra for c, extra in zip(a, padding)]
+    else:
+        parts = [c.word + c.sep for c in a[:-1]]
+    parts.append(a[-1].word)
 
-            # Text to be prepended to the next line
-            if rfragment:
-                line_chunks = [Chunk(rfragment, prevsep)]
-            else:
-                line_chunks = []
+    return "".join(parts)
 
-    except StopIteration:
-        # Ignore yield failure due to running out of words
-        pass
 
-    except GeneratorExit:
-        pass
+def distribute_padding(num_gaps: int, sentence_end_gaps: Sequence[int], delta: int,
+                       rng: random.Random, padding: Optional[MutableSequence[int]] = None) -> MutableSequence[int]:
+    """
+    Work out how many extra spaces go in each gap between words so that
+    `delta` spaces are added in total.  Each round of padding adds a space
+    after every sentence end then one to each of as many randomly-chosen gaps
+    as are needed, so sentence ends get double; a final partial round favours
+    sentence ends (in order) over random gaps.
+    @p sentence_end_gaps: Ascending numbers of the gaps after sentence ends
+    @p padding: List or array to fill in, instead of returning a new list
+    """
 
-    finally:
-        # Just print the remaining partial line without doing anything to it
-        if line_chunks:
-            dest.send(line_render(line_chunks))
+    num_sentence_ends = len(sentence_end_gaps)
+    if num_gaps > 0 and delta > 0:
+        rounds, delta = divmod(delta, num_sentence_ends + num_gaps)
+    else:
+        rounds = delta = 0
+
+    if padding is None:
+        padding = [rounds] * max(num_gaps, 0)
+    else:
+        del padding[:]
+        padding.extend([rounds] * max(num_gaps, 0))
+    if rounds:
+        for n in sentence_end_gaps:
+            padding[n] += rounds
+
+    if delta > num_sentence_ends:
+        for n in sentence_end_gaps:
+            padding[n] += 1
+        for n in rng.sample(range(num_gaps), delta - num_sentence_ends):
+            padding[n] += 1
+    else:
+        for n in sentence_end_gaps[0:delta]:
+            padding[n] += 1
+
+    return padding
 
 
 def indent_lines(indent: int, dest: Generator):
+    """
+    Coroutine that adds `indent` spaces to the start of each line; None is
+    passed through.
+    """
+
     prefix = " " * indent
 
     try:
         while True:
             line = yield
-            dest.send(prefix + line)
-
-    except StopIteration:
-        # Ignore yield failure due to running out of lines
-        pass
+            dest.send(line if line is None else prefix + line)
 
     except GeneratorExit:
         pass
@@ -280,45 +820,132 @@ def indent_lines(indent: int, dest: Generator):
 def collate_lines(dest: Generator):
     """
     Generator that takes a series of items and collects them into a single
-    string separated by newlines, which is sent to dest.
-
-    TO-DO: If None is received, assemble and send the current collection then restart
+    string separated by newlines, which is sent to dest when None is received
+    (or when closed).
     """
 
     try:
         lines = []
         while True:
             line = yield
-            lines.append(line)
-
-    except StopIteration:
-        # Ignore yield failure due to running out of lines
-        pass
+            if line is None:
+                if lines:
+                    dest.send("\n".join(lines))
+                    lines = []
+            else:
+                lines.append(line)
 
     except GeneratorExit:
         pass
 
     finally:
-        # Just print the remaining partial line without doing anything to it
+        # Send whatever was received since the last None
         if lines:
             para = "\n".join(lines)
             dest.send(para)
 
 
-def print_paras():
+def print_paras(output: Optional[IO[bytes]] = None, encoding: Optional[str] = None,
+                errors: str = 'strict', buffer_size: int = DEFAULT_BUFFER_SIZE):
+    """
+    Coroutine that writes paragraphs, with a blank line between each, to a
+    binary stream.  Output is collected until at least `buffer_size`
+    characters are ready, then encoded and written in one go; the rest is
+    written when closed.
+    @p output: Defaults to standard output, using its encoding
+    @p encoding: Defaults to the locale's preferred encoding
+    """
+
+    def write():
+        output.write("".join(pending).encode(encoding, errors))
+
+
+    # -- print_paras() --
+    if output is None:
+        sys.stdout.flush()
+        output = sys.stdout.buffer
+        encoding = encoding or sys.stdout.encoding
+    encoding = encoding or locale.getpreferredencoding(False)
+
     ## logger.debug("print_paras started")
-    prev = False
+    pending = []
+    pending_size = 0
     try:
+        para = yield
+        pending.append(para + "\n")
+        pending_size = len(para)
         while True:
             para = yield
             # Blank line between paragraphs
-            if prev:
-                print()
-            print(para)
-            prev = True
+            pending.append("\n" + para + "\n")
+            pending_size += len(para) + 2
+            if pending_size >= buffer_size:
+                write()
+                pending = []
+                pending_size = 0
+
+    except GeneratorExit:
+        pass
+
+    finally:
+        if pending:
+            write()
+        output.flush()
+
+
+def print_lines(output: Optional[IO[bytes]] = None, encoding: Optional[str] = None,
+                errors: str = 'strict', buffer_size: int = DEFAULT_BUFFER_SIZE):
+    """
+    Coroutine like print_paras() that receives single lines, with None after
+    each paragraph, and writes a blank line between paragraphs.  Output is
+    written once at least `buffer_size` characters are ready, whether or not
+    the paragraph has ended.
+    @p output: Defaults to standard output, using its encoding
+    @p encoding: Defaults to the locale's preferred encoding
+    """
+
+    def write():
+        output.write("".join(pending).encode(encoding, errors))
+
+
+    # -- print_lines() --
+    if output is None:
+        sys.stdout.flush()
+        output = sys.stdout.buffer
+        encoding = encoding or sys.stdout.encoding
+    encoding = encoding or locale.getpreferredencoding(False)
+
+    pending = []
+    pending_size = 0
+    in_para = False
+    gap = ""   # Blank line, once a paragraph has been written
+    try:
+        while True:
+            line = yield
+            if line is None:
+                if in_para:
+                    gap = "\n"
+                    in_para = False
+                continue
+
+            if not in_para:
+                pending.append(gap)
+                in_para = True
+            pending.append(line + "\n")
+            pending_size += len(line) + 1
+            if pending_size >= buffer_size:
+                write()
+                pending = []
+                pending_size = 0
+
     except GeneratorExit:
         pass
 
+    finally:
+        if pending:
+            write()
+        output.flush()
+
 
 ## def justify(input: TextIO):
 ##     """
@@ -330,23 +957,41 @@ def print_paras():
 ##         print(line)
 
 
-def init(parent_logger: logging.Logger):
-    global p, logger, pyphen_hyphenator
+def make_hyphenator(lang: Optional[str], cache: hyphenation.HyphenationCache,
+                    dict_file: Optional[str] = None) -> hyphenation.CachedHyphenator:
+    """
+    Create a pyphen-based hyphenator for `lang` (default: the current locale's);
+    the dictionary isn't loaded until it's needed.
+    @p dict_file: Compiled dictionary to use instead, whose language replaces
+                  `lang`; being memory-mapped, it's opened straight away
+    @raise ValueError: If `dict_file` isn't a compiled dictionary
+    """
 
-    logger = parent_logger.getChild("justifier")
+    if dict_file:
+        from . import hyphdict
+        compiled = hyphdict.CompiledDict(dict_file)
+        return hyphenation.CachedHyphenator(compiled, compiled.lang, cache)
 
-    if justifier.params.get('hyphenation') == 'pyphen':
-        pyphen_hyphenator = pyphen.Pyphen(lang=locale.getlocale()[0])
+    lang = lang or locale.getlocale()[0]
+    return hyphenation.CachedHyphenator(hyphenation.LazyPyphen(lang), lang, cache)
 
-    # reformat() uses create_folded_para(), possibly indent_lines() and collate_lines() in a sub-pipeline
-    p = utils.Pipeline(get_paras, reformat, print_paras)
-    ## print(p.chain[0])
-    ## p = FixedPipeline()
 
+def justify_file(input_path: str, output_path: str, stage: Tuple[Callable, Dict],
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, block_size: int = utils.DEFAULT_BLOCK_SIZE,
+                 instrumentation: Optional[utils.Instrumentation] = None, stream: bool = False):
+    """
+    Justify one file into another with a pipeline of its own.
+    @p stage: Reformatting coroutine and its keyword args, e.g. `reformat_stage`
+    @p stream: `stage` is stream_reformat() or equivalent
+    """
 
-def process(input: Iterable[str]):
-    p.send_lines(input)
+    with open(input_path, "rb") as input, open(output_path, "wb") as output_file:
+        fp = utils.Pipeline(get_para_lines if stream else get_paras, stage,
+                            (print_lines if stream else print_paras, {'output': output_file, 'buffer_size': buffer_size}),
+                            instrumentation=instrumentation)
+        fp.send_all(utils.read_lines(input, block_size=block_size))
+        fp.close()
 
 
-def finalise():
-    p.close()
+def output_path_for(input_path: str, output_dir: str) -> str:
+    return os.path.join(output_dir, os.path.basename(input_path))
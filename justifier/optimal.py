@@ -0,0 +1,262 @@
+"""
+Total-fit (Knuth-Plass style) line breaking, as an alternative to the greedy
+line filling done by justifier.create_folded_para().
+"""
+
+from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, Callable, Generator, Type, Optional, TextIO, IO
+import math
+import random
+
+from . import justifier
+from . import utils
+
+
+# *** DEFINITIONS ***
+DEFAULT_WINDOW = 512   # Maximum words held before lines are committed
+LINE_PENALTY = 10
+HYPHEN_PENALTY = 50
+MAX_BADNESS = 10000
+OVERFULL_DEMERITS = 10 ** 12
+
+
+# *** CLASSES ***
+class Breakpoint:
+    """
+    A possible line break, either after word number `word` or within it at
+    `split` (a (first part, last part) tuple), with the lowest total demerits
+    of any set of lines leading up to it.
+
+    `end` is the character position where a line ending here ends, and
+    `start` and `next_word` are where the following line starts.
+    """
+
+    __slots__ = ('word', 'split', 'end', 'start', 'next_word', 'cost', 'prev')
+
+    def __init__(self, word: int, split: Optional[Tuple[str, str]], end: int, start: int):
+        self.word = word
+        self.split = split
+        self.end = end
+        self.start = start
+        self.next_word = word if split else word + 1
+        self.cost = 0
+        self.prev = None   # Breakpoint
+
+
+
+# *** FUNCTIONS ***
+def create_optimal_para(dest: Generator, line_width: int = justifier.DEFAULT_LINE_WIDTH,
+                        hyphenation: str = 'pyphen', hyphenator=None, skip_urls: bool = False,
+                        seed: Optional[int] = None, window: int = DEFAULT_WINDOW,
+                        stats: Optional[utils.Instrumentation] = None):
+    """
+    Coroutine with the same interface as justifier.create_folded_para() that
+    chooses line breaks to minimise the total demerits of each paragraph.
+    Hyphenation points are breakpoints with a penalty; a word is hyphenated
+    at most once.
+
+    Only breakpoints from which a line could still reach the current word are
+    considered, so time is linear in the paragraph length.  Once `window`
+    words are held, lines that all remaining candidates agree on are sent;
+    if they don't agree far enough back, the best path so far is committed
+    to, so memory use is bounded too.
+    @p hyphenator: hyphenation.CachedHyphenator or equivalent; needed if
+                   `hyphenation` is 'pyphen'
+    @p stats: Counts lines padded
+    """
+
+    def word_splits(word: str) -> List[Tuple[str, str]]:
+        if hyphenation == 'none' or len(word) < min_fragment_len * 2 or \
+                (skip_urls and justifier.URL_LIKE_REGEX.search(word)):
+            return []
+        elif hyphenation == 'pyphen':
+            splits = hyphenator.splits(word)
+        else:
+            splits = [(word[:n], word[n:]) for n in range(min_fragment_len, len(word) - min_fragment_len + 1)]
+
+        return [s for s in splits if len(s[0]) < line_width]
+
+
+    def connect(b: Breakpoint, last: bool = False) -> bool:
+        """
+        Find the active breakpoint that gives `b` the lowest total demerits;
+        returns False if no line from an active breakpoint to `b` fits.
+        """
+
+        penalty = HYPHEN_PENALTY ** 2 if b.split else 0
+        b.prev = None
+        for a in active:
+            # Only one break within a word
+            if a.word < b.word or (a.word == b.word and a.split and not b.split):
+                slack = line_width - (b.end - a.start)
+                if slack >= 0:
+                    num_gaps = b.word - a.next_word
+                    if last:
+                        badness = 0
+                    elif num_gaps:
+                        badness = min(100 * (slack / num_gaps) ** 3, MAX_BADNESS)
+                    else:
+                        badness = MAX_BADNESS if slack else 0
+
+                    cost = a.cost + (LINE_PENALTY + badness) ** 2 + penalty
+                    if b.prev is None or cost < b.cost:
+                        b.cost = cost
+                        b.prev = a
+
+        return b.prev is not None
+
+
+    def send_lines(path: List[Breakpoint], last: bool = False):
+        """
+        Send the lines between consecutive breakpoints in `path`; the final
+        line is not padded if `last` is set.
+        """
+
+        for n in range(len(path) - 1):
+            a, b = path[n], path[n + 1]
+            line = chunks[a.next_word - base:b.word - base + 1]
+            if a.split:
+                line[0] = justifier.Chunk(a.split[1], line[0].sep)
+            if b.split:
+                line[-1] = justifier.Chunk(b.split[0] + "-", " ")
+
+            if last and n == len(path) - 2:
+                dest.send(justifier.render_line(line))
+            else:
+                num_gaps = len(line) - 1
+                sentence_end_gaps = [k for k in range(num_gaps) if line[k].word.endswith(justifier.SENTENCE_ENDINGS)]
+                padding = justifier.distribute_padding(num_gaps, sentence_end_gaps,
+                                                       line_width - (b.end - a.start), rng)
+                dest.send(justifier.render_line(line, padding))
+                if stats:
+                    stats.counters['lines_padded'] += 1
+
+
+    def path_to(b: Breakpoint) -> List[Breakpoint]:
+        path = []
+        while b is not None:
+            path.append(b)
+            b = b.prev
+        path.reverse()
+        return path
+
+
+    def commit():
+        """
+        Send the lines that all active breakpoints agree on, going at least
+        halfway through the window by following the best path so far.
+        """
+
+        nonlocal active, root, last_end, base, chunks
+
+        path = path_to(min(active, key=lambda a: a.cost))
+        positions = {id(b): k for k, b in enumerate(path)}
+
+        # Find where each active breakpoint's path joins the best path
+        joins = []
+        for a in active:
+            while id(a) not in positions:
+                a = a.prev
+            joins.append(positions[id(a)])
+
+        target = 0
+        halfway = num_words - window // 2
+        while target + 1 < len(path) and path[target + 1].word <= halfway:
+            target += 1
+        new_root = max(min(joins), target)
+        if new_root == 0:
+            return
+
+        # Breakpoints whose paths don't go through the new root are linked up
+        # to ones that do, if possible (they're in order of position)
+        old_active = active
+        active = []
+        for a, k in zip(old_active, joins):
+            if k >= new_root or connect(a):
+                active.append(a)
+        if last_end not in active:
+            last_end = max(active, key=lambda a: a.word)
+        send_lines(path[:new_root + 1])
+
+        # Forget everything before the new root
+        root = path[new_root]
+        root.prev = None
+        chunks = chunks[root.next_word - base:]
+        base = root.next_word
+
+
+    def finish_para():
+        if num_words == base:
+            return
+
+        end = Breakpoint(last_end.word, None, last_end.end, last_end.start)
+        if not connect(end, last=True):
+            # Nothing fits, so fall back to the usual ending
+            end = last_end
+        send_lines(path_to(end), last=True)
+
+
+    def reset():
+        nonlocal active, root, last_end, base, chunks, num_words, pos
+
+        num_words = 0
+        base = 0
+        pos = 0
+        chunks = []   # List[Chunk], from word number `base` onwards
+        root = Breakpoint(-1, None, 0, 0)
+        last_end = root
+        active = [root]
+        if seed is not None:
+            rng.seed(seed)
+
+
+    # -- create_optimal_para() --
+    min_fragment_len = math.ceil(justifier.min_fragment_length(line_width))
+    rng = random.Random(seed)
+    num_words = base = pos = 0   # pos is the character position of the next word
+    chunks = active = root = last_end = None
+    reset()
+    try:
+        while True:
+            batch = yield
+            if batch is None:
+                finish_para()
+                dest.send(None)
+                reset()
+                continue
+            elif isinstance(batch, tuple):
+                batch = (batch,)
+
+            for word, sep in batch:
+                chunks.append(justifier.Chunk(word, sep))
+                word_num = num_words
+                num_words += 1
+
+                # Breaks within this word (only if it would overflow a line from
+                # some active breakpoint), then after it
+                new_active = []
+                overflows = pos + len(word) - active[0].start > line_width
+                for split in (word_splits(word) if overflows else ()):
+                    b = Breakpoint(word_num, split, pos + len(split[0]) + 1, pos + len(word) - len(split[1]))
+                    if connect(b):
+                        new_active.append(b)
+                active.extend(new_active)
+                end = Breakpoint(word_num, None, pos + len(word), pos + len(word) + len(sep))
+                if not connect(end):
+                    # Overfull line, e.g. a word that's longer than the line width
+                    end.prev = last_end
+                    end.cost = last_end.cost + OVERFULL_DEMERITS
+                last_end = end
+                pos = end.start
+
+                # Drop breakpoints from which a line can no longer reach this word
+                active = [a for a in active if end.end - a.start <= line_width]
+                active.append(end)
+
+                if num_words - base >= window and num_words % (window // 4 or 1) == 0:
+                    commit()
+
+    except GeneratorExit:
+        pass
+
+    finally:
+        finish_para()
@@ -0,0 +1,151 @@
+"""
+Persistent cache of formatted paragraphs, so that re-justifying an edited
+document only reformats the paragraphs that changed.
+"""
+
+from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, Callable, Generator, Type, Optional, TextIO, IO
+import os
+import json
+import sqlite3
+import hashlib
+
+import justifier   # This package's top-level module
+from . import utils
+
+
+# *** DEFINITIONS ***
+CACHE_FORMAT_VERSION = 2   # 2: simple hyphenation leaves longer last parts
+KEY_OPTIONS = ('line_width', 'indent', 'hyphenation', 'skip_urls', 'sep_regex', 'seed', 'optimal')
+WRITE_BATCH_SIZE = 1000
+
+
+# *** CLASSES ***
+class ParagraphCache:
+    """
+    Formatted paragraphs in an SQLite database, keyed on a hash of each
+    paragraph's text plus everything that affects how it's formatted.
+    Padding must be reproducible (i.e. a seed given) for the cached output to
+    be the same as reformatting would give.
+
+    New entries are written in batches, and when close() is called.
+    """
+
+    def __init__(self, filename: str, options: Dict, lang: Optional[str] = None,
+                 hyphen_dict_file: Optional[str] = None):
+        """
+        @p options: Keyword args for justifier.reformat()
+        @p lang: Hyphenation language, if hyphenating with pyphen
+        @p hyphen_dict_file: Compiled dictionary used instead of pyphen's, if any
+        """
+
+        if options.get('seed') is None:
+            raise ValueError("The paragraph cache needs a seed, so that padding is reproducible")
+
+        self.hits = 0
+        self.misses = 0
+        self._pending = []   # List[Tuple[bytes, str]]
+        self._base_hash = hashlib.sha256(fingerprint(options, lang, hyphen_dict_file).encode("utf-8"))
+        self.db = sqlite3.connect(filename)
+        self.db.execute("CREATE TABLE IF NOT EXISTS paras (key BLOB PRIMARY KEY, output TEXT NOT NULL)")
+
+
+    def key(self, lines: Sequence[str]) -> bytes:
+        h = self._base_hash.copy()
+        h.update("\n".join(lines).encode("utf-8", "surrogatepass"))
+        return h.digest()
+
+
+    def get(self, key: bytes) -> Optional[str]:
+        row = self.db.execute("SELECT output FROM paras WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        else:
+            self.hits += 1
+            return row[0]
+
+
+    def put(self, key: bytes, output: str):
+        self._pending.append((key, output))
+        if len(self._pending) >= WRITE_BATCH_SIZE:
+            self.flush()
+
+
+    def flush(self):
+        if self._pending:
+            with self.db:
+                self.db.executemany("INSERT OR REPLACE INTO paras (key, output) VALUES (?, ?)", self._pending)
+            self._pending = []
+
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+
+# *** FUNCTIONS ***
+def fingerprint(options: Dict, lang: Optional[str], hyphen_dict_file: Optional[str] = None) -> str:
+    """
+    Everything besides the text that a paragraph's output depends on,
+    including the versions of this package and (if used) pyphen, or the
+    compiled dictionary's path, size and modification time.
+    """
+
+    settings = {k: options.get(k) for k in KEY_OPTIONS}
+    settings['format'] = CACHE_FORMAT_VERSION
+    settings['version'] = justifier.__version__
+    if options.get('hyphenation') == 'pyphen':
+        from importlib import metadata
+
+        settings['lang'] = lang
+        try:
+            settings['pyphen'] = metadata.version('pyphen')
+        except metadata.PackageNotFoundError:
+            settings['pyphen'] = None
+        if hyphen_dict_file:
+            st = os.stat(hyphen_dict_file)
+            settings['hyphen_dict'] = [os.path.abspath(hyphen_dict_file), st.st_size, st.st_mtime_ns]
+    return json.dumps(settings, sort_keys=True)
+
+
+def cached_reformat(dest: Generator, cache: ParagraphCache, reformat_fn: Callable, options: Dict,
+                    stats: Optional[utils.Instrumentation] = None):
+    """
+    Coroutine that sends each paragraph's output from `cache` if it's there,
+    and otherwise reformats it with `reformat_fn` (justifier.reformat() or
+    equivalent) and adds it.
+    @p options: Keyword args for `reformat_fn`
+    """
+
+    # `reformat_fn` records its own stages in `stats`, if it's in `options`
+    p = utils.Pipeline((reformat_fn, options), utils.Collector)
+    results = p.chain[-1].items
+    try:
+        while True:
+            para = yield
+            key = cache.key(para)
+            output = cache.get(key)
+            if output is None:
+                p.send(para)
+                # An empty string is stored for paragraphs with no output,
+                # i.e. nothing but whitespace
+                output = results[0] if results else ""
+                results.clear()
+                cache.put(key, output)
+            if output:
+                dest.send(output)
+
+    except GeneratorExit:
+        pass
+
+    finally:
+        p.close()
+        if stats:
+            stats.counters['para_cache_hits'] = cache.hits
+            stats.counters['para_cache_misses'] = cache.misses
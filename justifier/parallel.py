@@ -0,0 +1,119 @@
+"""
+Spreads paragraphs across a pool of worker processes.
+"""
+
+from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, Callable, Generator, Type, Optional, TextIO, IO
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Executor
+
+from . import justifier
+from . import hyphenation
+from . import utils
+
+
+# *** DEFINITIONS ***
+worker_options = None   # Dict; keyword args for justifier.reformat() in a worker process
+worker_reformat = None   # Callable; justifier.reformat() or equivalent, chosen by init_worker()
+
+
+# *** FUNCTIONS ***
+def init_worker(options: Dict, lang: Optional[str], engine: str = 'auto', hyphen_dict_file: Optional[str] = None):
+    """
+    Runs once in each worker process; creates that process's own hyphenator,
+    which maps any compiled dictionary rather than loading a copy of it.
+    """
+
+    global worker_options, worker_reformat
+
+    worker_options = dict(options)
+    if options['hyphenation'] == 'pyphen':
+        worker_options['hyphenator'] = justifier.make_hyphenator(lang, hyphenation.HyphenationCache(),
+                                                                  hyphen_dict_file)
+    worker_reformat = justifier.select_reformat(worker_options, engine)
+
+
+def make_executor(jobs: int, options: Dict, lang: Optional[str], engine: str = 'auto',
+                  hyphen_dict_file: Optional[str] = None) -> ProcessPoolExecutor:
+    """
+    @p options: Keyword args for justifier.reformat(); any hyphenator is
+                replaced by one created in each worker for `lang`, and stats
+                aren't collected in the workers
+    @p engine: See justifier.select_reformat()
+    @p hyphen_dict_file: Compiled dictionary for the workers' hyphenators
+    """
+
+    worker_args = {k: v for k, v in options.items() if k not in ('hyphenator', 'stats')}
+    return ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(worker_args, lang, engine, hyphen_dict_file))
+
+
+def reformat_batch(paras: List[List[str]]) -> List[str]:
+    """
+    Runs in a worker process: reformat a batch of paragraphs, each a list of
+    lines, returning the formatted paragraphs in order.
+    """
+
+    p = utils.Pipeline((worker_reformat, worker_options), utils.Collector)
+    for para in paras:
+        p.send(para)
+    p.close()
+
+    return p.chain[-1].items
+
+
+def justify_batch(texts: List[str]) -> List[str]:
+    """
+    Runs in a worker process: justify a batch of whole documents.
+    """
+
+    results = []
+    for text in texts:
+        p = utils.Pipeline(justifier.get_paras, (worker_reformat, worker_options), utils.Collector)
+        p.send_lines(text.split("\n"))
+        p.close()
+        results.append("\n\n".join(p.chain[-1].items))
+
+    return results
+
+
+def justify_file(input_path: str, output_path: str, buffer_size: int, block_size: int):
+    """
+    Runs in a worker process: see justifier.justify_file().
+    """
+
+    justifier.justify_file(input_path, output_path, (worker_reformat, worker_options), buffer_size, block_size)
+
+
+def parallel_reformat(dest: Generator, executor: Executor, jobs: int, batch_size: int = justifier.DEFAULT_BATCH_SIZE):
+    """
+    Coroutine that does the same as justifier.reformat() but sends batches of
+    paragraphs to `executor`.  Paragraphs are sent to `dest` in input order;
+    at most two batches per job are in flight at a time.
+    """
+
+    def send_results(future):
+        for para in future.result():
+            dest.send(para)
+
+
+    # -- parallel_reformat() --
+    pending = deque()   # Deque[Future]
+    batch = []
+    try:
+        while True:
+            batch.append((yield))
+            if len(batch) >= batch_size:
+                pending.append(executor.submit(reformat_batch, batch))
+                batch = []
+
+                # Pass on whatever is ready, waiting if too much is in flight
+                while pending and (pending[0].done() or len(pending) > jobs * 2):
+                    send_results(pending.popleft())
+
+    except GeneratorExit:
+        pass
+
+    finally:
+        if batch:
+            pending.append(executor.submit(reformat_batch, batch))
+        while pending:
+            send_results(pending.popleft())
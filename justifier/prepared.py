@@ -0,0 +1,302 @@
+"""
+"Prepare once, render many": a document tokenised once, which can then be
+justified at any width without re-parsing it.
+"""
+
+from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, Callable, Generator, Type, Optional, TextIO, IO
+import os
+import sys
+import json
+import base64
+import locale
+import random
+import bisect
+from itertools import accumulate, compress, repeat
+from operator import add, sub
+from array import array
+
+from . import justifier
+from . import hyphenation as hyphenation_mod
+from . import utils
+
+
+# *** DEFINITIONS ***
+FILE_VERSION = 1
+
+
+# *** CLASSES ***
+class PreparedDocument:
+    """
+    The (word, separator) chunks of each paragraph of a document, held in
+    parallel lists, plus the hyphenation points of every word that has had to
+    be hyphenated so far.  Rendering gives the same output as reformat() with
+    greedy filling, but skips tokenising and, once a word's hyphenation points
+    are known, the hyphenation dictionary.  Where each word ends
+    (as if the whole document were on one line) is worked out up front, so
+    each line break is found with a bisect instead of word by word.
+
+    Safe to render from several threads at once.
+    """
+
+    def __init__(self, words: List[str], seps: List[str], para_ends: Sequence[int], hyphenation: str = 'pyphen',
+                 lang: Optional[str] = None, sep_regex: str = justifier.DEFAULT_SEP_REGEX,
+                 hyphen_cache: Optional[hyphenation_mod.HyphenationCache] = None):
+        """
+        @p para_ends: Index in `words` after each paragraph's last word
+        @p hyphen_cache: Hyphenation points already known, e.g. from load()
+        """
+
+        if hyphenation not in justifier.HYPHENATION_METHODS:
+            raise ValueError("Unknown hyphenation method '%s'" % hyphenation)
+
+        self.words = words
+        self.seps = seps
+        self.para_ends = array('I', para_ends)
+        self.hyphenation = hyphenation
+        self.lang = lang or locale.getlocale()[0]
+        self.sep_regex = sep_regex
+        self.ends = array('q', map(sub, accumulate(map(add, map(len, words), map(len, seps))), map(len, seps)))
+        self.sentence_ends = array('I', compress(range(len(words)),
+                                                 map(str.endswith, words, repeat(justifier.SENTENCE_ENDINGS))))
+        if hyphenation == 'pyphen':
+            # Unbounded, since it only holds this document's words
+            self.hyphen_cache = hyphen_cache if hyphen_cache is not None else \
+                hyphenation_mod.HyphenationCache(sys.maxsize)
+            self.hyphenator = justifier.make_hyphenator(self.lang, self.hyphen_cache)
+        else:
+            self.hyphen_cache = None
+            self.hyphenator = None
+
+
+    def __len__(self):
+        return len(self.para_ends)
+
+
+    def render_paras(self, line_width: int = justifier.DEFAULT_LINE_WIDTH, indent: int = 0,
+                     seed: Optional[int] = None) -> List[str]:
+        """
+        Justify the document, returning the formatted paragraphs (i.e. those
+        with any words) as strings of newline-separated lines.
+        @p seed: Makes padding reproducible
+        """
+
+        hypenate_fn = justifier.get_hypenate_fn(self.hyphenation, self.hyphenator, line_width)
+        prefix = " " * indent
+        rng = random.Random(seed)
+        paras = []
+        start = 0
+        for end in self.para_ends:
+            if seed is not None:
+                rng.seed(seed)
+            lines = fold_words(self.words, self.seps, self.ends, self.sentence_ends, start, end, line_width,
+                               hypenate_fn, rng, prefix)
+            if lines:
+                paras.append("\n".join(lines))
+            start = end
+        return paras
+
+
+    def render(self, line_width: int = justifier.DEFAULT_LINE_WIDTH, indent: int = 0,
+               seed: Optional[int] = None) -> str:
+        """
+        Justify the document, returning it without a trailing newline.
+        """
+
+        return "\n\n".join(self.render_paras(line_width, indent, seed))
+
+
+    def save(self, filename: str):
+        """
+        Write the document to `filename`, with its words as a single string
+        plus an array of where each ends, and each separator as an index into
+        a table of the distinct ones.
+        """
+
+        sep_table = {}   # Dict[str, int]
+        sep_ids = array('I', (sep_table.setdefault(sep, len(sep_table)) for sep in self.seps))
+        word_ends = array('I')
+        pos = 0
+        for word in self.words:
+            pos += len(word)
+            word_ends.append(pos)
+
+        data = {'version': FILE_VERSION,
+                'byteorder': sys.byteorder,
+                'hyphenation': self.hyphenation,
+                'lang': self.lang,
+                'sep_regex': self.sep_regex,
+                'text': "".join(self.words),
+                'word_ends': encode_array(word_ends),
+                'seps': list(sep_table),
+                'sep_ids': encode_array(sep_ids),
+                'para_ends': encode_array(self.para_ends),
+                'hyphen_cache': self.hyphen_cache.dump() if self.hyphen_cache is not None else None}
+
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_filename, filename)
+
+
+    @classmethod
+    def load(cls, filename: str) -> 'PreparedDocument':
+        """
+        Read a document written by save().
+        """
+
+        with open(filename, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get('version') != FILE_VERSION:
+            raise ValueError("Unsupported prepared document version in %s" % filename)
+
+        swap = data['byteorder'] != sys.byteorder
+        text = data['text']
+        starts = [0]
+        starts.extend(decode_array(data['word_ends'], swap))
+        words = [text[starts[n]:starts[n + 1]] for n in range(len(starts) - 1)]
+        sep_table = data['seps']
+        seps = [sep_table[n] for n in decode_array(data['sep_ids'], swap)]
+
+        hyphen_cache = None
+        if data['hyphen_cache']:
+            hyphen_cache = hyphenation_mod.HyphenationCache(sys.maxsize)
+            hyphen_cache.merge(data['hyphen_cache'])
+        return cls(words, seps, decode_array(data['para_ends'], swap), data['hyphenation'], data['lang'],
+                   data['sep_regex'], hyphen_cache)
+
+
+
+# *** FUNCTIONS ***
+def prepare(lines: Iterable[str], hyphenation: str = 'pyphen', lang: Optional[str] = None,
+            sep_regex: str = justifier.DEFAULT_SEP_REGEX) -> PreparedDocument:
+    """
+    Split lines of text (without line endings) into paragraphs and tokenise
+    them, e.g. prepare(text.split("\\n")).
+    @p hyphenation: 'pyphen', 'simple' or 'none'
+    @p lang: Language for pyphen, defaulting to the current locale's
+    """
+
+    reo = None if sep_regex == justifier.DEFAULT_SEP_REGEX else justifier.make_word_regex(sep_regex)
+    p = utils.Pipeline(justifier.get_paras, utils.Collector)
+    p.send_lines(lines)
+    p.close()
+
+    words = []
+    seps = []
+    para_ends = array('I')
+    for para in p.chain[-1].items:
+        chunks = justifier.tokenise(para, reo)
+        if chunks:
+            para_words, para_seps = zip(*chunks)
+            words += para_words
+            seps += para_seps
+        para_ends.append(len(words))
+
+    return PreparedDocument(words, seps, para_ends, hyphenation, lang, sep_regex)
+
+
+def fold_words(words: Sequence[str], seps: Sequence[str], ends: Sequence[int], sentence_ends: Sequence[int],
+               start: int, end: int, line_width: int, hypenate_fn: Optional[Callable], rng: random.Random,
+               prefix: str = "", stats: Optional[utils.Instrumentation] = None,
+               next_breaks: Optional[Sequence[int]] = None) -> List[str]:
+    """
+    Fill lines with words `start` to `end` in the same way as
+    fused.fold_para(), finding each line break with a search of `ends`.
+    @p ends: Where each word ends, as if all the words were on one line
+    @p sentence_ends: Indices of the words that end sentences, in order
+    @p stats: Counts hyphenation attempts and failures, and lines padded
+    @p next_breaks: If known, the first word that doesn't fit on a line that
+                    starts with each word, so that only lines starting with
+                    part of a word need a search
+    """
+
+    def sentence_end_gaps(last: int) -> List[int]:
+        # Gaps on the line after words that end sentences, for words before
+        # `last`; a carried-over fragment is the line's first word
+        offset = 1 if carried else 0
+        lo = bisect.bisect_left(sentence_ends, first)
+        hi = bisect.bisect_left(sentence_ends, last, lo)
+        gaps = [k - first + offset for k in sentence_ends[lo:hi]]
+        if carried and carried.endswith(justifier.SENTENCE_ENDINGS) and len(line) > 1:
+            gaps.insert(0, 0)
+        return gaps
+
+
+    # -- fold_words() --
+    min_fragment_len = justifier.min_fragment_length(line_width)
+
+    lines = []
+    line = justifier.LineBuffer()
+    first = start   # First whole word on the line
+    anchor = start   # Word the line starts with, unless it starts with part of one
+    carried = ""   # Word or part of one carried over to the start of the line
+    # The line's length with words up to n is ends[n] - line_start (with a
+    # carried-over fragment of a word counting as the end of it)
+    line_start = ends[start] - len(words[start]) if start < end else 0
+    while True:
+        # The first word that doesn't fit
+        if next_breaks is not None and anchor is not None:
+            n = max(next_breaks[anchor], first)
+        else:
+            n = bisect.bisect_right(ends, line_start + line_width, first, end)
+        if n == end:
+            break
+
+        line.extend(words, seps, first, n)
+        if line:
+            line_len = ends[n - 1] - line_start
+            prevsep = seps[n - 1]
+        else:
+            line_len = 0
+            prevsep = ""
+
+        word = words[n]
+        delta = line_width - line_len
+        lfragment = ""
+        if hypenate_fn and delta - len(prevsep) >= min_fragment_len and len(word) >= min_fragment_len * 2:
+            if stats:
+                stats.counters['hyphenation_attempts'] += 1
+            try:
+                lfragment, rfragment = hypenate_fn(word, delta - len(prevsep))
+                line.append(lfragment, " ")
+                delta -= len(lfragment) + len(prevsep)
+            except ValueError:
+                lfragment = ""
+                if stats:
+                    stats.counters['hyphenation_failures'] += 1
+        if not lfragment:
+            rfragment = word
+
+        if line:
+            # The line's last word (if it's a whole one) has no gap after it
+            line.pad(delta, rng, sentence_end_gaps(n if lfragment else n - 1))
+            lines.append(line.render(prefix))
+            if stats:
+                stats.counters['lines_padded'] += 1
+
+        line.clear()
+        carried = rfragment
+        anchor = None if lfragment else n
+        if rfragment:
+            line.append(rfragment, seps[n])
+        first = n + 1
+        line_start = ends[n] - len(rfragment)
+
+    # The remaining partial line isn't padded
+    line.extend(words, seps, first, end)
+    if line:
+        lines.append(line.render(prefix))
+
+    return lines
+
+
+def encode_array(a: array) -> str:
+    return base64.b64encode(a.tobytes()).decode("ascii")
+
+
+def decode_array(data: str, swap: bool = False) -> array:
+    a = array('I')
+    a.frombytes(base64.b64decode(data))
+    if swap:
+        a.byteswap()
+    return a
@@ -0,0 +1,267 @@
+"""
+A daemon that keeps justification engines (and their hyphenation
+dictionaries and cache) resident and serves requests over a Unix domain
+socket, plus the matching client.
+
+Each message is a 4-byte big-endian length followed by that many bytes of
+UTF-8 JSON.  A request is {"text": ..., "options": {...}}, where the options
+are any of REQUEST_OPTIONS, and the reply is either {"text": ...} or
+{"error": ...}.  Several requests can be sent over one connection.
+
+asyncio and the engine are only imported by the daemon, to keep the client's
+startup time down.
+"""
+
+from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, Callable, Generator, Type, Optional, TextIO, IO
+import os
+import json
+import socket
+import struct
+import signal
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+from . import hyphenation
+
+
+# *** DEFINITIONS ***
+REQUEST_OPTIONS = ('line_width', 'indent', 'hyphenation', 'lang', 'skip_urls', 'seed', 'optimal')
+HEADER = struct.Struct(">I")
+MAX_MESSAGE_SIZE = 1 << 30
+MAX_ENGINES = 32   # Number of differently-configured Justifiers kept
+
+logger = logging.getLogger("server")
+
+
+# *** CLASSES ***
+class ProtocolError(Exception):
+    pass
+
+
+class JustifierServer:
+    """
+    Serves each connection in a coroutine; the justifying itself is done in
+    a thread pool, by a Justifier for each combination of options in use.
+    """
+
+    def __init__(self, defaults: Optional[Dict] = None,
+                 hyphen_cache: Optional[hyphenation.HyphenationCache] = None):
+        """
+        @p defaults: Keyword args for api.Justifier, used where a request
+                     doesn't give an option
+        """
+
+        self.defaults = defaults or {}
+        self.hyphen_cache = hyphen_cache if hyphen_cache is not None else hyphenation.HyphenationCache()
+        self.engines = OrderedDict()   # OrderedDict[Tuple, api.Justifier]
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+        self._loop = None   # asyncio.AbstractEventLoop
+        self._stop = None   # asyncio.Event
+
+
+    def get_engine(self, options: Dict) -> 'api.Justifier':
+        from . import api
+
+        unknown = set(options) - set(REQUEST_OPTIONS)
+        if unknown:
+            raise ValueError("Unknown option(s) %s" % ", ".join(sorted(unknown)))
+
+        kwargs = dict(self.defaults, **options)
+        if kwargs.get('hyphenation', 'pyphen') != 'pyphen':
+            # The daemon's compiled dictionary isn't needed for this request
+            kwargs.pop('hyphen_dict_file', None)
+        key = tuple(sorted(kwargs.items()))
+        with self._lock:
+            engine = self.engines.get(key)
+            if engine:
+                self.engines.move_to_end(key)
+                return engine
+
+        engine = api.Justifier(hyphen_cache=self.hyphen_cache, **kwargs)
+        with self._lock:
+            self.engines[key] = engine
+            if len(self.engines) > MAX_ENGINES:
+                self.engines.popitem(last=False)[1].close()
+        return engine
+
+
+    def handle_request(self, request: Dict) -> Dict:
+        try:
+            text = request['text']
+            if not isinstance(text, str):
+                raise TypeError("text must be a string")
+            return {'text': self.get_engine(request.get('options') or {}).justify(text)}
+        except (KeyError, ValueError, TypeError) as e:
+            logger.debug("bad request: %s", e)
+            return {'error': "%s: %s" % (type(e).__name__, e)}
+        except Exception as e:
+            # e.g. a compiled dictionary that can't be read; other requests
+            # may still succeed, so the daemon carries on
+            logger.warning("request failed: %s", e, exc_info=True)
+            return {'error': "%s: %s" % (type(e).__name__, e)}
+
+
+    async def handle_connection(self, reader: 'asyncio.StreamReader', writer: 'asyncio.StreamWriter'):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break   # Client has finished
+                size, = HEADER.unpack(header)
+                if size > MAX_MESSAGE_SIZE:
+                    raise ProtocolError("Message too big (%d bytes)" % size)
+                request = decode_message(await reader.readexactly(size))
+
+                reply = await loop.run_in_executor(None, self.handle_request, request)
+                writer.write(encode_message(reply))
+                await writer.drain()
+
+        except (ProtocolError, asyncio.IncompleteReadError, ConnectionError) as e:
+            logger.warning("dropping connection: %s", e)
+
+        finally:
+            writer.close()
+
+
+    async def serve(self, socket_path: str):
+        """
+        Serve until stop() is called or a SIGTERM or SIGINT is received.
+        """
+
+        import asyncio
+
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                self._loop.add_signal_handler(signum, self._stop.set)
+            except (ValueError, RuntimeError):
+                pass   # Not in the main thread
+
+        remove_stale_socket(socket_path)
+        # Only this user can connect, from the moment the socket exists
+        old_umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+        finally:
+            os.umask(old_umask)
+        logger.debug("listening on %s", socket_path)
+        try:
+            async with server:
+                self.ready.set()
+                await self._stop.wait()
+        finally:
+            os.unlink(socket_path)
+            self.close()
+
+
+    def stop(self):
+        """
+        Stop serving; can be called from any thread.
+        """
+
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+
+    def close(self):
+        with self._lock:
+            for engine in self.engines.values():
+                engine.close()
+            self.engines.clear()
+
+
+
+# *** FUNCTIONS ***
+def default_socket_path() -> str:
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, "justifier.sock")
+    else:
+        return os.path.join(tempfile.gettempdir(), "justifier-%d.sock" % os.getuid())
+
+
+def encode_message(message: Dict) -> bytes:
+    data = json.dumps(message).encode("utf-8")
+    return HEADER.pack(len(data)) + data
+
+
+def decode_message(data: bytes) -> Dict:
+    try:
+        message = json.loads(data.decode("utf-8"))
+    except ValueError as e:
+        raise ProtocolError("Bad message: %s" % e)
+    if not isinstance(message, dict):
+        raise ProtocolError("Message isn't an object")
+    return message
+
+
+def remove_stale_socket(socket_path: str):
+    """
+    Remove a socket left behind by a daemon that's no longer running, or
+    raise OSError if one is.
+    """
+
+    if not os.path.exists(socket_path):
+        return
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except ConnectionRefusedError:
+            os.unlink(socket_path)
+        else:
+            raise OSError("A daemon is already listening on %s" % socket_path)
+
+
+def run_server(socket_path: str, defaults: Optional[Dict] = None,
+               hyphen_cache_file: Optional[str] = None, hyphen_cache_size: int = hyphenation.DEFAULT_CACHE_SIZE):
+    """
+    Serve until stopped by a signal, loading and saving the hyphenation
+    cache in `hyphen_cache_file` if given.
+    """
+
+    import asyncio
+
+    hyphen_cache = hyphenation.HyphenationCache(hyphen_cache_size)
+    if hyphen_cache_file and os.path.exists(hyphen_cache_file):
+        hyphen_cache.load(hyphen_cache_file)
+
+    asyncio.run(JustifierServer(defaults, hyphen_cache).serve(socket_path))
+
+    if hyphen_cache_file:
+        hyphen_cache.save(hyphen_cache_file)
+
+
+def recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(min(size - len(data), 1024 * 1024))
+        if not chunk:
+            raise ProtocolError("Connection closed by daemon")
+        data += chunk
+    return bytes(data)
+
+
+def request(text: str, options: Optional[Dict] = None, socket_path: Optional[str] = None) -> str:
+    """
+    Have a daemon justify `text`, returning the result as api.Justifier.justify() would.
+    @p options: Any of REQUEST_OPTIONS
+    """
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path or default_socket_path())
+        sock.sendall(encode_message({'text': text, 'options': options or {}}))
+        size, = HEADER.unpack(recv_exactly(sock, HEADER.size))
+        reply = decode_message(recv_exactly(sock, size))
+
+    if 'error' in reply:
+        raise ValueError(reply['error'])
+    return reply['text']
@@ -1,11 +1,20 @@
 from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, Callable, Generator, Type, Optional, TextIO, IO
+import io
+import os
+import stat
+import mmap
+import codecs
+import time
+import locale
 import logging
+from collections import OrderedDict, Counter
 
 ## import justifier   # This package's top-level module
 
 
 # *** DEFINITIONS ***
-logger = None   # logging.Logger
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+logger = logging.getLogger("utils")
 
 
 # *** CLASSES ***
@@ -22,7 +31,7 @@ class Pipeline:
     https://docs.python.org/3/reference/expressions.html#generator.send
     """
 
-    def __init__(self, *args):
+    def __init__(self, *args, instrumentation: Optional['Instrumentation'] = None):
         """
         Supports the following entities from which to build the chain:
           - generator function
@@ -32,6 +41,8 @@ class Pipeline:
 
         Each entity must have a close() method.
         All entities but the last must accept a `dest` keyword arg.
+        @p instrumentation: If given, each entity is wrapped so that its items
+                            and time are recorded
         """
 
         self.chain = []
@@ -60,6 +71,9 @@ class Pipeline:
                 if isinstance(generator, Generator):
                     generator.send(None)
 
+            if instrumentation:
+                name = entity[0] if isinstance(entity, Tuple) else entity
+                generator = instrumentation.wrap(generator, getattr(name, '__name__', type(name).__name__))
             self.chain.insert(0, generator)
 
             # Prepare for the next cycle
@@ -103,9 +117,237 @@ class Pipeline:
             g.close()
 
 
-            
+class Collector:
+    """
+    Chain entity that appends each item it receives to a list, for use at the
+    end of a pipeline whose results are wanted by the caller.
+    """
+
+    def __init__(self):
+        self.items = []
+
+
+    def send(self, item):
+        self.items.append(item)
+
+
+    def close(self):
+        pass
+
+
+class LazyFile:
+    """
+    A binary file that isn't opened (and so truncated) until open() is
+    called or it's first written to, so that nothing is created if there's
+    an error before any output is ready.
+    """
+
+    def __init__(self, filename: str, mode: str = "wb"):
+        self.filename = filename
+        self.mode = mode
+        self._file = None   # IO[bytes]
+
+
+    def open(self) -> IO[bytes]:
+        if self._file is None:
+            self._file = open(self.filename, self.mode)
+        return self._file
+
+
+    def write(self, data: bytes) -> int:
+        return self.open().write(data)
+
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class StageStats:
+    """
+    Counts for one kind of chain entity, over all the pipelines it's in.
+    `time` doesn't include time spent in later stages.
+    """
+
+    __slots__ = ('name', 'items_in', 'items_out', 'time')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.time = 0.0
+
+
+
+class Instrumentation:
+    """
+    Records the items in and out of, and time spent in, each stage of one
+    or more pipelines, plus any `counters` that stages choose to update.
+    Not thread-safe; use one per thread.
+    """
+
+    def __init__(self):
+        self.stages = OrderedDict()   # OrderedDict[str, StageStats]
+        self.counters = Counter()
+        self.start_time = time.perf_counter()
+        self._stack = []   # List[StageStats]; stages currently running, innermost last
+        self._mark = 0.0   # When the innermost stage last started running
+
+
+    def wrap(self, target, name: str) -> 'InstrumentedStage':
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats(name)
+        return InstrumentedStage(target, stats, self)
+
+
+    def enter(self, stats: StageStats, item: bool = True):
+        """
+        Start timing `stats`'s stage, pausing the stage that called it (which
+        sent it an item, unless `item` is False).
+        """
+
+        now = time.perf_counter()
+        if self._stack:
+            caller = self._stack[-1]
+            caller.time += now - self._mark
+            if item:
+                caller.items_out += 1
+        self._stack.append(stats)
+        self._mark = now
+
+
+    def leave(self):
+        now = time.perf_counter()
+        self._stack.pop().time += now - self._mark
+        self._mark = now
+
+
+    def summary(self) -> str:
+        """
+        A table of the stages, plus rates for the 'paragraphs' and 'words'
+        counters and any other counters.
+        """
+
+        elapsed = time.perf_counter() - self.start_time
+        lines = ["%-22s %10s %10s %9s %6s" % ("stage", "items in", "items out", "time (s)", "%")]
+        # Stages are created last first
+        for stats in reversed(self.stages.values()):
+            lines.append("%-22s %10d %10d %9.3f %6.1f" % (stats.name, stats.items_in, stats.items_out, stats.time,
+                                                        stats.time / elapsed * 100 if elapsed else 0))
+        lines.append("elapsed %.3f s" % elapsed)
+        for name in ('paragraphs', 'words'):
+            if name in self.counters:
+                lines.append("%s: %d (%.0f/s)" % (name, self.counters[name], self.counters[name] / elapsed))
+        for name, count in sorted(self.counters.items()):
+            if name not in ('paragraphs', 'words'):
+                lines.append("%s: %d" % (name.replace("_", " "), count))
+        return "\n".join(lines)
+
+
+
+class InstrumentedStage:
+    """
+    Stands in for a chain entity, recording its items and time in an
+    Instrumentation.
+    """
+
+    __slots__ = ('target', 'stats', 'instrumentation')
+
+    def __init__(self, target, stats: StageStats, instrumentation: Instrumentation):
+        self.target = target
+        self.stats = stats
+        self.instrumentation = instrumentation
+
+
+    def send(self, item):
+        self.stats.items_in += 1
+        self.instrumentation.enter(self.stats)
+        try:
+            return self.target.send(item)
+        finally:
+            self.instrumentation.leave()
+
+
+    def close(self):
+        # Closing can flush items on to later stages
+        self.instrumentation.enter(self.stats, item=False)
+        try:
+            self.target.close()
+        finally:
+            self.instrumentation.leave()
+
+
+
 # *** FUNCTIONS ***
 def init(parent_logger: logging.Logger):
     global logger
 
     logger = parent_logger.getChild("utils")
+
+
+def complete_lines(text: str, pieces: List[str]) -> List[str]:
+    """
+    The lines that `text` completes, without their line endings or trailing
+    whitespace.  `pieces` holds the incomplete line before `text` and is
+    updated in place; it's only joined once the line is complete, so a long
+    line costs no more than a short one per block.
+    """
+
+    lines = text.split("\n")
+    if len(lines) == 1:
+        pieces.append(text)
+        return []
+
+    if pieces:
+        pieces.append(lines[0])
+        lines[0] = "".join(pieces)
+        pieces.clear()
+    pieces.append(lines.pop())
+    return [line.rstrip() for line in lines]
+
+
+def read_lines(input: IO[bytes], encoding: Optional[str] = None, errors: str = 'strict',
+               block_size: int = DEFAULT_BLOCK_SIZE) -> Iterable[List[str]]:
+    """
+    Read a binary stream in large blocks (memory-mapping it if it's a regular
+    file) and yield a list of lines from each block, without their line
+    endings or trailing whitespace.  Lines are split on "\\n" only.
+    @p encoding: Defaults to the locale's preferred encoding
+    """
+
+    decoder = codecs.getincrementaldecoder(encoding or locale.getpreferredencoding(False))(errors)
+
+    try:
+        fileno = input.fileno()
+        mapped = stat.S_ISREG(os.fstat(fileno).st_mode) and os.fstat(fileno).st_size > 0
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        mapped = False
+
+    if mapped:
+        data = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        blocks = (data[n:n + block_size] for n in range(input.tell(), len(data), block_size))
+    else:
+        data = None
+        blocks = iter(lambda: input.read(block_size), b"")
+
+    try:
+        pieces = []   # Incomplete last line so far, one piece per block
+        for block in blocks:
+            lines = complete_lines(decoder.decode(block), pieces)
+            if lines:
+                yield lines
+
+        pieces.append(decoder.decode(b"", final=True))
+        partial = "".join(pieces)
+        if partial:
+            yield [partial.rstrip()]
+
+    finally:
+        if data is not None:
+            data.close()
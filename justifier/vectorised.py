@@ -0,0 +1,89 @@
+"""
+Engine that finds line breaks with NumPy array operations rather than
+checking each word in turn, for very long paragraphs and large batches.
+Needs NumPy, which is an optional extra (`pip install text-justifier[numpy]`).
+"""
+
+from typing import Set, Dict, Sequence, Tuple, List, Union, AnyStr, Iterable, Callable, Generator, Type, Optional, TextIO, IO
+import random
+from itertools import repeat
+from operator import itemgetter
+
+import numpy
+
+from . import justifier
+from . import utils
+from .prepared import fold_words
+
+
+# *** FUNCTIONS ***
+def supports(options: Dict) -> bool:
+    """
+    Whether numpy_reformat() can handle the given keyword args for
+    justifier.reformat().
+    """
+
+    return not options.get('optimal')
+
+
+def para_arrays(words: Sequence[str], seps: Sequence[str], line_width: int) -> Tuple[numpy.ndarray, ...]:
+    """
+    Where each word ends (as if they were all on one line), the first word
+    that doesn't fit on a line starting with each word, and the indices of
+    the words that end sentences.
+    """
+
+    count = len(words)
+    word_lengths = numpy.fromiter(map(len, words), numpy.int64, count)
+    sep_lengths = numpy.fromiter(map(len, seps), numpy.int64, count)
+    ends = numpy.cumsum(word_lengths + sep_lengths) - sep_lengths
+    next_breaks = ends.searchsorted(ends - word_lengths + line_width, 'right')
+    sentence_ends = numpy.flatnonzero(numpy.fromiter(map(str.endswith, words, repeat(justifier.SENTENCE_ENDINGS)),
+                                                     numpy.bool_, count))
+    return ends, next_breaks, sentence_ends
+
+
+def numpy_reformat(dest: Generator, line_width: int = justifier.DEFAULT_LINE_WIDTH, indent: int = 0,
+                   hyphenation: str = 'pyphen', hyphenator=None, skip_urls: bool = False,
+                   sep_regex: str = justifier.DEFAULT_SEP_REGEX, seed: Optional[int] = None, optimal: bool = False,
+                   stats: Optional[utils.Instrumentation] = None):
+    """
+    Coroutine with the same interface and output as justifier.reformat(),
+    for the options that supports() accepts.  Where each line would break,
+    if it started with each word, is found for the whole paragraph in one
+    go from cumulative word lengths; only the words that overflow a line are
+    looked at individually, to hyphenate them, and a line that starts with
+    the rest of a hyphenated word needs a search of its own.
+    @p hyphenator: pyphen.Pyphen or equivalent; needed if `hyphenation` is 'pyphen'
+    @p stats: Counts paragraphs, words etc.; there are no stages to record
+    """
+
+    if not supports({'optimal': optimal}):
+        raise ValueError("The numpy engine only does greedy filling")
+
+    hypenate_fn = justifier.get_hypenate_fn(hyphenation, hyphenator, line_width, skip_urls)
+    reo = None if sep_regex == justifier.DEFAULT_SEP_REGEX else justifier.make_word_regex(sep_regex)
+    prefix = " " * indent
+    rng = random.Random(seed)
+    try:
+        while True:
+            para = yield
+            if seed is not None:
+                rng.seed(seed)
+            chunks = justifier.tokenise(para, reo)
+            if stats:
+                stats.counters['paragraphs'] += 1
+                stats.counters['words'] += len(chunks)
+            if not chunks:
+                continue
+
+            words = list(map(itemgetter(0), chunks))
+            seps = list(map(itemgetter(1), chunks))
+            # Single elements are much quicker to get from lists
+            ends, next_breaks, sentence_ends = (a.tolist() for a in para_arrays(words, seps, line_width))
+            lines = fold_words(words, seps, ends, sentence_ends, 0, len(words), line_width, hypenate_fn, rng,
+                               prefix, stats, next_breaks)
+            dest.send("\n".join(lines))
+
+    except GeneratorExit:
+        pass
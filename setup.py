@@ -12,6 +12,9 @@ with open('HISTORY.rst') as history_file:
 
 requirements = ['Click>=7.0', 'pyphen>=0.10.0']
 
+# Optional engines
+extras_requirements = {'numpy': ['numpy>=1.13']}
+
 setup_requirements = [ ]
 
 test_requirements = [ ]
@@ -32,10 +35,12 @@ setup(
         'Programming Language :: Python :: 3.8',
     ],
     description="Justify and hyphenate text in files and/or standard input",
+    extras_require=extras_requirements,
     entry_points={
         'console_scripts': [
             'text-justifier=justifier.cli:main',
             'justify=justifier.cli:main',
+            'justify-compile-dict=justifier.cli:compile_hyphen_dict',
         ],
     },
     install_requires=requirements,
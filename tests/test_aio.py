@@ -0,0 +1,84 @@
+"""Tests for the asyncio front end."""
+
+
+import unittest
+import asyncio
+
+from justifier import aio
+from justifier.api import Justifier
+from .test_justifier import text_lines
+
+
+TEXT = "\n\n".join([text_lines] * 10)
+
+
+async def lines_of(text: str, counter=None):
+    for line in text.split("\n"):
+        if counter is not None:
+            counter.append(line)
+        await asyncio.sleep(0)
+        yield line
+
+
+async def collect(agen):
+    return [item async for item in agen]
+
+
+class TestAsync(unittest.TestCase):
+    """Tests for `justifier.aio`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.engine = Justifier(line_width=30, hyphenation='simple', seed=1)
+        self.expected = self.engine.justify(TEXT)
+
+    def test_async_iterable(self):
+        paras = asyncio.run(collect(aio.justify_paras(self.engine, lines_of(TEXT), batch_size=3)))
+        self.assertEqual(self.expected, "\n\n".join(paras))
+        lines = asyncio.run(collect(aio.justify_lines(self.engine, lines_of(TEXT))))
+        self.assertEqual(self.expected, "\n".join(lines))
+
+    def test_stream_reader(self):
+        async def run():
+            reader = asyncio.StreamReader()
+            data = TEXT.encode("utf-8")
+            # Split in the middle of lines
+            for n in range(0, len(data), 100):
+                reader.feed_data(data[n:n + 100])
+            reader.feed_eof()
+            return await collect(aio.justify_paras(self.engine, reader, encoding="utf-8", batch_size=4))
+
+        self.assertEqual(self.expected, "\n\n".join(asyncio.run(run())))
+
+    def test_concurrent_streams(self):
+        async def run():
+            engines = [Justifier(line_width=20 + n, hyphenation='none', seed=n) for n in range(5)]
+            results = await asyncio.gather(*(collect(aio.justify_paras(engine, lines_of(TEXT)))
+                                             for engine in engines))
+            return engines, results
+
+        engines, results = asyncio.run(run())
+        for engine, paras in zip(engines, results):
+            self.assertEqual(engine.justify(TEXT), "\n\n".join(paras))
+
+    def test_backpressure(self):
+        async def run():
+            consumed = []
+            paras = aio.justify_paras(self.engine, lines_of(TEXT, consumed), batch_size=2)
+            await paras.__anext__()
+            for _ in range(20):
+                await asyncio.sleep(0)
+            read = len(consumed)
+            await paras.aclose()
+            return read
+
+        # Only a few paragraphs' worth of the input is read ahead
+        self.assertLess(asyncio.run(run()), len(TEXT.split("\n")) // 2)
+
+    def test_error(self):
+        async def broken():
+            yield "Some words"
+            raise IOError("connection lost")
+
+        with self.assertRaises(IOError):
+            asyncio.run(collect(aio.justify_paras(self.engine, broken())))
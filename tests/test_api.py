@@ -0,0 +1,86 @@
+"""Tests for the library interface."""
+
+
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from justifier.api import Justifier
+from justifier.hyphenation import HyphenationCache
+from .test_justifier import text_lines
+
+
+class TestJustifierAPI(unittest.TestCase):
+    """Tests for `justifier.api.Justifier`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.justifier = Justifier(line_width=40, hyphenation='none')
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def check_output(self, output: str, width: int = 40, indent: int = 0):
+        paras = output.split("\n\n")
+        self.assertEqual(2, len(paras))
+        for para in paras:
+            lines = para.split("\n")
+            for line in lines[:-1]:
+                self.assertEqual(indent + width, len(line.rstrip()), msg=line)
+        self.assertEqual(text_lines.split(), output.split())
+
+    def test_justify(self):
+        self.check_output(self.justifier.justify(text_lines))
+
+    def test_justify_lines(self):
+        output_lines = list(self.justifier.justify_lines(line + "\n" for line in text_lines.split("\n")))
+        self.assertEqual(1, output_lines.count(""))
+        self.check_output("\n".join(output_lines))
+
+    def test_indent(self):
+        j = Justifier(line_width=30, indent=4, hyphenation='none')
+        output = j.justify(text_lines)
+        self.check_output(output, width=30, indent=4)
+        self.assertTrue(all(line.startswith("    ") for line in output.split("\n") if line))
+
+    def test_justify_many_threaded(self):
+        j = Justifier(line_width=35, hyphenation='pyphen', lang='en_US')
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(j.justify, [text_lines] * 20))
+        self.assertEqual(20, len(results))
+        self.assertEqual(j.justify_many([text_lines] * 20)[0].count("\n"), results[0].count("\n"))
+
+    def test_jobs(self):
+        texts = ["%d\n\n%s" % (n, text_lines) for n in range(5)]
+        with Justifier(line_width=40, hyphenation='none', jobs=2, batch_size=1) as j:
+            output = j.justify(texts[0])
+            self.assertEqual(texts[0].split(), output.split())
+            self.assertEqual([text.split() for text in texts],
+                             [result.split() for result in j.justify_many(texts)])
+
+    def test_seed(self):
+        j = Justifier(line_width=50, hyphenation='none', seed=1)
+        output = j.justify(text_lines)
+        self.assertEqual(output, j.justify(text_lines))
+        # Each paragraph is padded independently of what came before it
+        self.assertEqual(output.split("\n\n")[1], j.justify(text_lines.split("\n\n")[1]))
+        for line in output.split("\n"):
+            self.assertEqual(line, line.rstrip())
+
+    def test_invalid(self):
+        for kwargs in ({'line_width': 0}, {'line_width': -5}, {'indent': -2}, {'jobs': 0}, {'batch_size': 0},
+                       {'hyphenation': 'bogus'}, {'engine': 'bogus'}, {'sep_regex': "("}):
+            with self.assertRaises(ValueError, msg=kwargs):
+                Justifier(hyphenation=kwargs.pop('hyphenation', 'none'), **kwargs)
+
+    def test_shared_cache(self):
+        try:
+            import pyphen
+        except ImportError:
+            self.skipTest("pyphen isn't installed")
+
+        # An empty cache is still shared, rather than replaced by one of the Justifier's own
+        shared = HyphenationCache()
+        j = Justifier(line_width=20, lang='en_US', hyphen_cache=shared)
+        self.assertIs(shared, j.hyphen_cache)
+        j.justify(text_lines)
+        self.assertGreater(len(shared), 0)
@@ -0,0 +1,101 @@
+"""Differential tests for the fused engine against the coroutine pipeline."""
+
+
+import unittest
+import random
+
+from justifier import justifier
+from justifier import utils
+from justifier import hyphenation
+from justifier.fused import fused_reformat, supports
+from justifier.api import Justifier
+from .test_justifier import text_lines
+
+
+def run(reformat_fn, paras, **options):
+    p = utils.Pipeline((reformat_fn, options), utils.Collector)
+    for para in paras:
+        p.send(para)
+    p.close()
+    return p.chain[-1].items
+
+
+def random_paras(rng: random.Random, count: int):
+    """
+    Paragraphs with awkward spacing: runs of separators, leading and
+    trailing whitespace, tabs, sentence ends and very long words.
+    """
+
+    words = text_lines.split() + ["x" * 70, "supercalifragilisticexpialidocious", "a.", "I!", "—"]
+    seps = [" ", " ", " ", "  ", "\t", " \t "]
+    paras = []
+    for _ in range(count):
+        lines = []
+        for _ in range(rng.randint(1, 6)):
+            line = "".join(rng.choice(words) + rng.choice(seps) for _ in range(rng.randint(1, 12)))
+            if rng.random() < 0.2:
+                line = rng.choice(seps) + line
+            if rng.random() < 0.5:
+                line = line.rstrip()
+            if rng.random() < 0.05:
+                line = rng.choice(seps)
+            lines.append(line)
+        paras.append(lines)
+    return paras
+
+
+class TestFused(unittest.TestCase):
+    """Tests for `justifier.fused.fused_reformat`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.paras = random_paras(random.Random(0), 200)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def check_same(self, **options):
+        expected = run(justifier.reformat, self.paras, seed=3, **options)
+        self.assertEqual(expected, run(fused_reformat, self.paras, seed=3, **options))
+
+    def test_no_hyphenation(self):
+        for line_width in (1, 5, 20, 37, 60, 100):
+            with self.subTest(line_width=line_width):
+                self.check_same(line_width=line_width, hyphenation='none')
+
+    def test_simple_hyphenation(self):
+        for line_width in (10, 25, 60):
+            with self.subTest(line_width=line_width):
+                self.check_same(line_width=line_width, hyphenation='simple')
+
+    def test_pyphen_hyphenation(self):
+        hyphenator = justifier.make_hyphenator('en_US', hyphenation.HyphenationCache())
+        for line_width in (12, 30, 72):
+            with self.subTest(line_width=line_width):
+                self.check_same(line_width=line_width, hyphenation='pyphen', hyphenator=hyphenator)
+
+    def test_skip_urls(self):
+        words = text_lines.split() + ["https://example.com/a/long/path", "some_identifier_name", "getLineWidth"]
+        rng = random.Random(4)
+        self.paras = [[" ".join(rng.choice(words) for _ in range(30))] for _ in range(50)]
+        for line_width in (16, 40):
+            with self.subTest(line_width=line_width):
+                self.check_same(line_width=line_width, hyphenation='simple', skip_urls=True)
+
+    def test_indent(self):
+        self.check_same(line_width=30, indent=4, hyphenation='simple')
+
+    def test_supports(self):
+        self.assertTrue(supports({'line_width': 30, 'hyphenation': 'none'}))
+        self.assertFalse(supports({'optimal': True}))
+        self.assertFalse(supports({'sep_regex': r"[ ]"}))
+        self.assertIs(fused_reformat, justifier.select_reformat({}))
+        self.assertIs(justifier.reformat, justifier.select_reformat({'optimal': True}))
+        self.assertIs(justifier.reformat, justifier.select_reformat({}, 'pipeline'))
+        with self.assertRaises(ValueError):
+            justifier.select_reformat({'optimal': True}, 'fused')
+
+    def test_api(self):
+        text = "\n\n".join("\n".join(para) for para in self.paras)
+        expected = Justifier(line_width=33, hyphenation='simple', seed=1, engine='pipeline').justify(text)
+        self.assertEqual(expected, Justifier(line_width=33, hyphenation='simple', seed=1, engine='fused').justify(text))
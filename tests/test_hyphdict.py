@@ -0,0 +1,102 @@
+"""Tests for compiled hyphenation dictionaries."""
+
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from justifier import justifier
+from justifier.api import Justifier
+from .test_justifier import text_lines
+from .test_startup import imported_after
+
+try:
+    import pyphen
+    from justifier import hyphdict
+except ImportError:
+    pyphen = None
+
+
+def sample_words(rng: random.Random, patterns, count: int):
+    # Runs of letters from the dictionary's own patterns, so that plenty of
+    # them match
+    letters = [key.strip(".") for key in patterns if key.strip(".")]
+    words = ["".join(rng.sample(letters, 3)) for _ in range(count)]
+    return words + [word.upper() for word in words[:100]] + [word.title() for word in words[100:200]]
+
+
+@unittest.skipUnless(pyphen, "pyphen isn't installed")
+class TestCompiledDict(unittest.TestCase):
+    """Tests for `justifier.hyphdict`."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up fixtures shared by the tests."""
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.filenames = {}
+        for lang in ('en_US', 'ca'):
+            cls.filenames[lang] = os.path.join(cls.tmpdir, lang + ".hyd")
+            hyphdict.compile_dict(cls.filenames[lang], lang)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Tear down fixtures shared by the tests."""
+        shutil.rmtree(cls.tmpdir)
+
+    def test_same_as_pyphen(self):
+        rng = random.Random(3)
+        for lang, filename in self.filenames.items():
+            compiled = hyphdict.CompiledDict(filename)
+            self.assertEqual(lang, compiled.lang)
+            expected = pyphen.Pyphen(lang=lang)
+            for word in sample_words(rng, expected.hd.patterns, 1000) + text_lines.split():
+                self.assertEqual(list(expected.iterate(word)), list(compiled.iterate(word)), msg=word)
+            compiled.close()
+
+    def test_nonstandard(self):
+        # Catalan's "l·l" loses its middle dot when split
+        compiled = hyphdict.CompiledDict(self.filenames['ca'])
+        expected = pyphen.Pyphen(lang='ca')
+        for word in ("paral·lel", "PARAL·LEL", "Col·lecció", "intel·ligent"):
+            self.assertEqual(list(expected.iterate(word)), list(compiled.iterate(word)))
+        self.assertEqual(('paral', 'lel'), next(compiled.iterate("paral·lel")))
+
+    def test_from_dic_file(self):
+        filename = os.path.join(self.tmpdir, "from_dic.hyd")
+        lang = hyphdict.compile_dict(filename, dic_filename=str(pyphen.LANGUAGES['en_US']))
+        self.assertEqual('en_US', lang)
+        with open(filename, "rb") as f, open(self.filenames['en_US'], "rb") as f2:
+            self.assertEqual(f2.read(), f.read())
+
+    def test_not_a_dict(self):
+        filename = os.path.join(self.tmpdir, "not_a_dict.hyd")
+        for data in (b"", b"JHYD", b"Some text that isn't a dictionary"):
+            with open(filename, "wb") as f:
+                f.write(data)
+            with self.assertRaises(ValueError):
+                hyphdict.CompiledDict(filename)
+        with self.assertRaises(ValueError):
+            hyphdict.compile_dict(filename, 'xx_no_such_language')
+
+    def test_justify(self):
+        filename = self.filenames['en_US']
+        text = "\n\n".join([text_lines] * 5)
+        expected = Justifier(line_width=20, lang='en_US', seed=2).justify(text)
+        j = Justifier(line_width=20, lang='de_DE', seed=2, hyphen_dict_file=filename)
+        self.assertEqual('en_US', j.lang)
+        self.assertEqual(expected, j.justify(text))
+        with Justifier(line_width=20, seed=2, hyphen_dict_file=filename, jobs=2, batch_size=1) as j:
+            self.assertEqual(expected, j.justify(text))
+
+    def test_options(self):
+        with self.assertRaises(ValueError):
+            justifier.Options(hyphenation='simple', hyphen_dict_file=self.filenames['en_US'])
+        options = justifier.Options(hyphen_dict_file=self.filenames['en_US'])
+        self.assertEqual(self.filenames['en_US'], options._replace(seed=1).hyphen_dict_file)
+
+    def test_pyphen_not_loaded(self):
+        self.assertEqual([], imported_after("from justifier import justifier, hyphenation\n"
+                                            "h = justifier.make_hyphenator('en_US', hyphenation.HyphenationCache(), %r)\n"
+                                            "h.wrap('hyphenation', 6)" % self.filenames['en_US']))
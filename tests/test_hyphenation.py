@@ -0,0 +1,61 @@
+"""Tests for the hyphenation cache."""
+
+
+import os
+import tempfile
+import unittest
+
+import pyphen
+
+from justifier import hyphenation
+
+
+words = ["hyphenation", "dictionary", "consecrated", "proposition", "a", "altogether"]
+
+
+class TestHyphenationCache(unittest.TestCase):
+    """Tests for HyphenationCache and CachedHyphenator."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.pyphen_hyphenator = pyphen.Pyphen(lang='en_US')
+        self.cache = hyphenation.HyphenationCache(maxsize=3)
+        self.hyphenator = hyphenation.CachedHyphenator(self.pyphen_hyphenator, 'en_US', self.cache)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_wrap_matches_pyphen(self):
+        for word in words:
+            for width in range(0, len(word) + 2):
+                self.assertEqual(self.pyphen_hyphenator.wrap(word, width),
+                                 self.hyphenator.wrap(word, width),
+                                 msg="%s at width %d" % (word, width))
+
+    def test_counters_and_eviction(self):
+        for word in ["hyphenation", "dictionary", "hyphenation"]:
+            self.hyphenator.wrap(word, 6)
+        self.assertEqual((1, 2), (self.cache.hits, self.cache.misses))
+
+        # "dictionary" is least recently used so is evicted first
+        self.hyphenator.wrap("consecrated", 6)
+        self.hyphenator.wrap("proposition", 6)
+        self.assertEqual(3, len(self.cache))
+        self.hyphenator.wrap("dictionary", 6)
+        self.assertEqual(5, self.cache.misses)
+
+    def test_save_and_load(self):
+        for word in words[:3]:
+            self.hyphenator.wrap(word, 6)
+
+        with tempfile.TemporaryDirectory() as dirname:
+            filename = os.path.join(dirname, "cache.json")
+            self.cache.save(filename)
+
+            cache = hyphenation.HyphenationCache()
+            cache.load(filename)
+            # No dictionary is needed for words already in the cache
+            warm = hyphenation.CachedHyphenator(None, 'en_US', cache)
+            for word in words[:3]:
+                self.assertEqual(self.pyphen_hyphenator.wrap(word, 8), warm.wrap(word, 8))
+            self.assertEqual((3, 0), (cache.hits, cache.misses))
@@ -4,10 +4,16 @@
 
 
 import unittest
+import os
+import random
+import io
+import tempfile
+from array import array
 from click.testing import CliRunner
 
 from justifier import justifier
 from justifier import cli
+from justifier import utils
 
 text_lines = """Lorem ipsum dolor sit amet, consectetur adipisicing elit, sed do eiusmod 
 tempor incididunt ut labore et dolore magna aliqua. Ut enim ad minim 
@@ -51,9 +57,12 @@ class TestJustifier(unittest.TestCase):
             gp.send(line)
             ## print("Line")
         gp.close()
-        result1 = results[0]
+        # Each paragraph is a list of lines
+        self.assertEqual(2, len(results))
+        self.assertEqual(3, len(results[0]))
+        result1 = " ".join(results[0])
         self.assertTrue(result1.startswith("Lorem ipsum dolor sit amet,"), msg="Bad result1: "+result1)
-        result2 = results[1]
+        result2 = " ".join(results[1])
         self.assertTrue(result2.startswith("commodo consequat."), msg="Bad result2: "+result2)
 
 
@@ -66,3 +75,263 @@ class TestJustifier(unittest.TestCase):
         help_result = runner.invoke(cli.main, ['--help'])
         assert help_result.exit_code == 0
         assert '--help  Show this message and exit.' in help_result.output
+
+
+class TestPadding(unittest.TestCase):
+    """Tests for `justifier.distribute_padding`."""
+
+    def test_sentence_ends_first(self):
+        rng = random.Random(0)
+        self.assertEqual([1, 0, 1, 0], justifier.distribute_padding(4, [0, 2], 2, rng))
+        self.assertEqual([1, 0, 0, 0], justifier.distribute_padding(4, [0, 2], 1, rng))
+        self.assertEqual([0, 0, 0], justifier.distribute_padding(3, [], 0, rng))
+        self.assertEqual([], justifier.distribute_padding(0, [], 5, rng))
+
+    def test_rounds(self):
+        rng = random.Random(0)
+        # Two full rounds of 2 + 4, then sentence ends plus one random gap
+        padding = justifier.distribute_padding(4, [0, 2], 15, rng)
+        self.assertEqual(15, sum(padding))
+        self.assertEqual([5, 5], [padding[0], padding[2]])
+        self.assertEqual(5, padding[1] + padding[3])
+        self.assertEqual({2, 3}, {padding[1], padding[3]})
+
+    def test_fill_in_place(self):
+        padding = array('I', [9, 9])
+        self.assertIs(padding, justifier.distribute_padding(4, [0, 2], 2, random.Random(0), padding))
+        self.assertEqual(array('I', [1, 0, 1, 0]), padding)
+
+
+class TestLineBuffer(unittest.TestCase):
+    """Tests for `justifier.LineBuffer`."""
+
+    def test_render(self):
+        line = justifier.LineBuffer()
+        for word, sep in [("One.", "  "), ("two", "\t"), ("three", " ")]:
+            line.append(word, sep)
+        self.assertEqual(3, len(line))
+        self.assertEqual("One.  two\tthree", line.render())
+        line.pad(3, random.Random(0))
+        self.assertEqual(3, sum(line.padding))
+        self.assertEqual(18, len(line.render()))
+        self.assertTrue(line.render("  ").startswith("  One.   "))
+
+    def test_reuse(self):
+        line = justifier.LineBuffer()
+        line.append("a", " ")
+        line.append("b", " ")
+        line.pad(2, random.Random(0))
+        line.clear()
+        self.assertEqual(0, len(line))
+        line.append("c", " ")
+        self.assertEqual("c", line.render())
+
+
+class TestOutput(unittest.TestCase):
+    """Tests for `justifier.print_paras`."""
+
+    def test_buffered_writes(self):
+        class CountingStream(io.BytesIO):
+            writes = 0
+
+            def write(self, data):
+                self.writes += 1
+                return super().write(data)
+
+        stream = CountingStream()
+        pp = justifier.print_paras(output=stream, encoding="utf-8", buffer_size=20)
+        pp.send(None)
+        for para in ["First para", "Ŝecond\nparagraph", "3", "4"]:
+            pp.send(para)
+        self.assertEqual(1, stream.writes)
+        pp.close()
+        self.assertEqual(2, stream.writes)
+        self.assertEqual("First para\n\nŜecond\nparagraph\n\n3\n\n4\n", stream.getvalue().decode("utf-8"))
+
+
+class TestBatch(unittest.TestCase):
+    """Tests for justifying several files in one run."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.inputs = []
+        for n, para in enumerate(text_lines.split("\n\n")):
+            path = os.path.join(self.tmpdir.name, "in%d.txt" % n)
+            with open(path, "w") as f:
+                f.write(para)
+            self.inputs.append(path)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmpdir.cleanup()
+
+    def run_cli(self, *args):
+        result = CliRunner().invoke(cli.main, ['-w', '30', '-H', '--seed', '1'] + list(args))
+        self.assertEqual(0, result.exit_code, msg=result.output)
+        return result.output
+
+    def test_output_dir(self):
+        output_dir = os.path.join(self.tmpdir.name, "out")
+        list_file = os.path.join(self.tmpdir.name, "list")
+        with open(list_file, "w") as f:
+            f.write(self.inputs[1] + "\n")
+        self.run_cli('-O', output_dir, '--files-from', list_file, self.inputs[0])
+        for path in self.inputs:
+            with open(os.path.join(output_dir, os.path.basename(path))) as f:
+                self.assertEqual(self.run_cli(path), f.read())
+
+    def test_concatenated(self):
+        # Paragraphs don't run into each other across files
+        output = self.run_cli(*self.inputs)
+        self.assertEqual(2, len(output.split("\n\n")))
+        self.assertEqual(text_lines.split(), output.split())
+
+    def test_overwrite(self):
+        result = CliRunner().invoke(cli.main, ['-O', self.tmpdir.name, self.inputs[0]])
+        self.assertNotEqual(0, result.exit_code)
+
+    def test_output_file_is_input(self):
+        with open(self.inputs[0]) as f:
+            before = f.read()
+        result = CliRunner().invoke(cli.main, ['-o', self.inputs[0], self.inputs[1], self.inputs[0]])
+        self.assertNotEqual(0, result.exit_code)
+        with open(self.inputs[0]) as f:
+            self.assertEqual(before, f.read())
+
+    def test_missing_input(self):
+        output = os.path.join(self.tmpdir.name, "out.txt")
+        result = CliRunner().invoke(cli.main, ['-o', output, os.path.join(self.tmpdir.name, "missing.txt")])
+        self.assertNotEqual(0, result.exit_code)
+        self.assertFalse(os.path.exists(output))
+
+
+class TestStream(unittest.TestCase):
+    """Tests for streaming lines instead of whole paragraphs."""
+
+    def test_same_lines(self):
+        lines = (text_lines + "\n\n  \n\n" + text_lines.replace(" ", "\t  ")).split("\n")
+        for options in ({'line_width': 30, 'hyphenation': 'simple', 'seed': 1},
+                        {'line_width': 20, 'indent': 2, 'hyphenation': 'none', 'seed': 2},
+                        {'line_width': 25, 'hyphenation': 'none', 'seed': 3, 'sep_regex': r"[\s,]"}):
+            p = utils.Pipeline(justifier.get_paras, (justifier.reformat, options), utils.Collector)
+            p.send_all([lines])
+            p.close()
+            expected = p.chain[-1].items
+
+            p = utils.Pipeline(justifier.get_para_lines, (justifier.stream_reformat, options), utils.Collector)
+            p.send_all([lines])
+            p.close()
+            paras = [[]]
+            for line in p.chain[-1].items:
+                if line is None:
+                    paras.append([])
+                else:
+                    paras[-1].append(line)
+            self.assertEqual(expected, ["\n".join(para) for para in paras if para])
+
+    def test_print_lines(self):
+        stream = io.BytesIO()
+        pl = justifier.print_lines(output=stream, encoding="utf-8", buffer_size=10)
+        pl.send(None)
+        for line in [None, "First", "para", None, None, "Ŝecond", None]:
+            pl.send(line)
+        self.assertEqual(b"First\npara\n", stream.getvalue())
+        pl.close()
+        self.assertEqual("First\npara\n\nŜecond\n", stream.getvalue().decode("utf-8"))
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "in.txt")
+            with open(path, "w") as f:
+                f.write(text_lines)
+            args = ['-w', '30', '-s', '--seed', '1', path]
+            expected = CliRunner().invoke(cli.main, ['--engine', 'pipeline'] + args).output
+            self.assertEqual(expected, CliRunner().invoke(cli.main, ['--stream'] + args).output)
+            self.assertNotEqual(0, CliRunner().invoke(cli.main, ['--stream', '--optimal'] + args).exit_code)
+
+
+class TestSimpleHyphenation(unittest.TestCase):
+    """Tests for `justifier.simple_hypenate` and `justifier.get_hypenate_fn`."""
+
+    def test_longest_first_part(self):
+        word = "incididunt"
+        for delta in range(2, len(word)):
+            lfragment, rfragment = justifier.simple_hypenate(word, delta)
+            self.assertEqual(delta, len(lfragment))
+            self.assertEqual(word, lfragment[:-1] + rfragment)
+            self.assertTrue(lfragment.endswith("-"))
+        self.assertEqual((word, ""), justifier.simple_hypenate(word, len(word)))
+        with self.assertRaises(ValueError):
+            justifier.simple_hypenate(word, 1)
+
+    def test_min_fragment_len(self):
+        self.assertEqual(("incididu-", "nt"), justifier.simple_hypenate("incididunt", 9))
+        self.assertEqual(("incidid-", "unt"), justifier.simple_hypenate("incididunt", 9, 3))
+        with self.assertRaises(ValueError):
+            justifier.simple_hypenate("incididunt", 3, 3)
+        hypenate_fn = justifier.get_hypenate_fn('simple', line_width=72)
+        self.assertEqual(("incidid-", "unt"), hypenate_fn("incididunt", 9))
+        hypenate_fn = justifier.get_hypenate_fn('simple', line_width=20)
+        self.assertEqual(("incididu-", "nt"), hypenate_fn("incididunt", 9))
+
+    def test_skip_urls(self):
+        hypenate_fn = justifier.get_hypenate_fn('simple', skip_urls=True)
+        for word in ("https://example.com/index.html", "www.example.com", "someone@example.com", "/usr/local/bin",
+                     "snake_case_name", "camelCaseName", "os.path.join", "aGVsbG8gd29ybGQ="):
+            with self.assertRaises(ValueError, msg=word):
+                hypenate_fn(word, 8)
+        for word in ("incididunt", "well-known", "laborum.", "3.14159265"):
+            self.assertEqual(justifier.simple_hypenate(word, 6), hypenate_fn(word, 6))
+        self.assertIsNone(justifier.get_hypenate_fn('none', skip_urls=True))
+
+
+class TestSession(unittest.TestCase):
+    """Tests for `justifier.Options` and `justifier.Session`."""
+
+    def test_validation(self):
+        options = justifier.Options(seed=1)
+        self.assertEqual(justifier.DEFAULT_LINE_WIDTH, options.line_width)
+        for bad in ({'line_width': 0}, {'hyphenation': 'fancy'}, {'engine': 'turbo'}, {'jobs': 0},
+                    {'para_cache_file': "x.db", 'seed': None}, {'stream': True, 'optimal': True},
+                    {'hyphen_cache_file': "x.json", 'jobs': 2}, {'sep_regex': "("}):
+            with self.assertRaises(ValueError):
+                options._replace(**bad)
+        with self.assertRaises(AttributeError):
+            options.line_width = 10
+
+    def test_empty_hyphen_cache_saved(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "hyphens.json")
+            session = justifier.Session(justifier.Options(lang='en_US', hyphen_cache_file=filename,
+                                                          output_file=os.path.join(tmpdir, "out.txt")))
+            session.process(["a b c"])
+            session.close()
+            self.assertTrue(os.path.exists(filename))
+
+    def test_concurrent(self):
+        import threading
+
+        lines = text_lines.split("\n") * 20
+        with tempfile.TemporaryDirectory() as tmpdir:
+            def run(options):
+                session = justifier.Session(options)
+                session.process(lines)
+                session.close()
+                with open(options.output_file) as f:
+                    return f.read()
+
+
+            all_options = [justifier.Options(line_width=20 + n, hyphenation='simple', seed=n,
+                                             output_file=os.path.join(tmpdir, "out%d.txt" % n))
+                           for n in range(8)]
+            expected = [run(options) for options in all_options]
+            results = [None] * len(all_options)
+            threads = [threading.Thread(target=lambda n=n: results.__setitem__(n, run(all_options[n])))
+                       for n in range(len(all_options))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(expected, results)
+            self.assertEqual(8, len(set(results)))
@@ -0,0 +1,65 @@
+"""Tests for optimal line breaking."""
+
+
+import unittest
+
+from justifier import justifier
+from justifier import utils
+from justifier.api import Justifier
+from justifier.optimal import create_optimal_para
+from .test_justifier import text_lines
+
+
+def fold(words, **options):
+    collector = utils.Collector()
+    p = utils.Pipeline((create_optimal_para, options), (justifier.collate_lines, {'dest': collector}))
+    for word in words:
+        p.send((word, " "))
+    p.send(None)
+    p.close()
+    return collector.items[0]
+
+
+class TestOptimal(unittest.TestCase):
+    """Tests for `justifier.optimal.create_optimal_para`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.words = text_lines.split() * 20
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def check_lines(self, output: str, width: int):
+        lines = output.split("\n")
+        for line in lines[:-1]:
+            self.assertEqual(width, len(line), msg=line)
+        self.assertLessEqual(len(lines[-1]), width)
+
+    def test_justified(self):
+        output = fold(self.words, line_width=37, hyphenation='none', seed=0)
+        self.check_lines(output, 37)
+        self.assertEqual(self.words, output.split())
+
+    def test_hyphenation(self):
+        output = fold(self.words, line_width=25, hyphenation='simple', seed=0)
+        self.check_lines(output, 25)
+        self.assertEqual("".join(self.words), output.replace("-\n", "").replace(" ", "").replace("\n", ""))
+
+    def test_small_window(self):
+        # A tiny window forces lines to be committed early but output is
+        # still valid
+        output = fold(self.words, line_width=30, hyphenation='none', seed=0, window=8)
+        self.check_lines(output, 30)
+        self.assertEqual(self.words, output.split())
+
+    def test_long_word(self):
+        output = fold(["a", "b" * 30, "c"], line_width=20, hyphenation='none')
+        self.assertEqual(["a", "b" * 30, "c"], output.split("\n"))
+
+    def test_api(self):
+        j = Justifier(line_width=40, hyphenation='pyphen', lang='en_US', optimal=True, seed=0)
+        output = j.justify(text_lines)
+        self.assertEqual(2, len(output.split("\n\n")))
+        for para in output.split("\n\n"):
+            self.check_lines(para, 40)
@@ -0,0 +1,107 @@
+"""Tests for the paragraph cache."""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from justifier import justifier
+from justifier import utils
+from justifier.paracache import ParagraphCache, cached_reformat
+from .test_justifier import text_lines
+
+
+OPTIONS = {'line_width': 30, 'hyphenation': 'simple', 'seed': 1}
+
+
+def paras():
+    return [line.split() for line in text_lines.split("\n") if line.strip()] + [["   "]]
+
+
+def run(cache, paras, **options):
+    p = utils.Pipeline((cached_reformat, {'cache': cache, 'reformat_fn': justifier.reformat, 'options': options}),
+                       utils.Collector)
+    for para in paras:
+        p.send(para)
+    p.close()
+    return p.chain[-1].items
+
+
+def run_uncached(paras, **options):
+    p = utils.Pipeline((justifier.reformat, options), utils.Collector)
+    for para in paras:
+        p.send(para)
+    p.close()
+    return p.chain[-1].items
+
+
+class TestParagraphCache(unittest.TestCase):
+    """Tests for `justifier.paracache`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, "paras.db")
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        shutil.rmtree(self.tmpdir)
+
+    def test_same_output(self):
+        expected = run_uncached(paras(), **OPTIONS)
+
+        cache = ParagraphCache(self.filename, OPTIONS)
+        self.assertEqual(run(cache, paras(), **OPTIONS), expected)
+        cache.close()
+        self.assertEqual(cache.hits, 0)
+
+        # Second run, from the file
+        cache = ParagraphCache(self.filename, OPTIONS)
+        self.assertEqual(run(cache, paras(), **OPTIONS), expected)
+        cache.close()
+        self.assertEqual(cache.misses, 0)
+        self.assertEqual(cache.hits, len(paras()))
+
+    def test_edited_para(self):
+        cache = ParagraphCache(self.filename, OPTIONS)
+        run(cache, paras(), **OPTIONS)
+        cache.close()
+
+        edited = paras()
+        edited[1] = edited[1] + ["extra"]
+        cache = ParagraphCache(self.filename, OPTIONS)
+        self.assertEqual(run(cache, edited, **OPTIONS), run_uncached(edited, **OPTIONS))
+        cache.close()
+        self.assertEqual(cache.misses, 1)
+
+    def test_options_in_key(self):
+        cache = ParagraphCache(self.filename, OPTIONS)
+        run(cache, paras(), **OPTIONS)
+        cache.close()
+
+        options = dict(OPTIONS, line_width=40)
+        cache = ParagraphCache(self.filename, options)
+        self.assertEqual(run(cache, paras(), **options), run_uncached(paras(), **options))
+        cache.close()
+        self.assertEqual(cache.hits, 0)
+
+    def test_dict_file_in_key(self):
+        options = dict(OPTIONS, hyphenation='pyphen')
+        dict_file = os.path.join(self.tmpdir, "en_US.hyd")
+
+        def key(dict_file):
+            cache = ParagraphCache(self.filename, options, 'en_US', dict_file)
+            cache.close()
+            return cache.key(["text"])
+
+        keys = [key(None)]
+        for data in (b"A dictionary", b"A rebuilt dictionary"):
+            with open(dict_file, "wb") as f:
+                f.write(data)
+            keys.append(key(dict_file))
+        self.assertEqual(3, len(set(keys)))
+
+    def test_needs_seed(self):
+        with self.assertRaises(ValueError):
+            ParagraphCache(self.filename, dict(OPTIONS, seed=None))
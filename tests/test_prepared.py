@@ -0,0 +1,72 @@
+"""Tests for prepared documents."""
+
+
+import os
+import random
+import tempfile
+import unittest
+
+from justifier.api import Justifier
+from justifier.hyphenation import HyphenationCache
+from justifier.prepared import PreparedDocument, prepare
+from .test_justifier import text_lines
+from .test_fused import random_paras
+
+
+TEXT = text_lines + "\n\n   \n\nSupercalifragilisticexpialidocious antidisestablishmentarianism.\n\n" + \
+       text_lines.replace(" ", "  \t")
+
+
+class TestPrepared(unittest.TestCase):
+    """Tests for `justifier.prepared`."""
+
+    def check(self, doc, hyphenation, **kwargs):
+        for width in (12, 30, 45, 72):
+            for indent in (0, 3):
+                expected = Justifier(line_width=width, indent=indent, hyphenation=hyphenation, seed=4,
+                                     engine='pipeline', **kwargs).justify(TEXT)
+                self.assertEqual(expected, doc.render(width, indent, seed=4), msg="width %d" % width)
+
+    def test_same_as_reformat(self):
+        for hyphenation in ('none', 'simple'):
+            self.check(prepare(TEXT.split("\n"), hyphenation), hyphenation)
+
+    def test_random(self):
+        rng = random.Random(5)
+        lines = "\n\n".join("\n".join(para) for para in random_paras(rng, 200)).split("\n")
+        doc = prepare(lines, 'simple')
+        for width in (5, 17, 40, 80):
+            expected = Justifier(line_width=width, hyphenation='simple', seed=2, engine='pipeline').justify_paras(lines)
+            self.assertEqual(list(expected), doc.render_paras(width, seed=2))
+
+    def test_custom_separators(self):
+        self.check(prepare(TEXT.split("\n"), 'simple', sep_regex=r"[\s,]"), 'simple', sep_regex=r"[\s,]")
+
+    def test_pyphen(self):
+        try:
+            import pyphen
+        except ImportError:
+            self.skipTest("pyphen isn't installed")
+
+        doc = prepare(TEXT.split("\n"), 'pyphen', lang='en_US')
+        self.check(doc, 'pyphen', lang='en_US')
+        self.assertGreater(len(doc.hyphen_cache), 0)
+
+        shared = HyphenationCache()
+        doc = PreparedDocument(doc.words, doc.seps, doc.para_ends, 'pyphen', 'en_US', hyphen_cache=shared)
+        self.assertIs(shared, doc.hyphen_cache)
+        doc.render(30)
+        self.assertGreater(len(shared), 0)
+
+    def test_save_load(self):
+        doc = prepare(TEXT.split("\n"), 'simple')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "doc.json")
+            doc.save(filename)
+            loaded = PreparedDocument.load(filename)
+
+        self.assertEqual(doc.words, loaded.words)
+        self.assertEqual(doc.seps, loaded.seps)
+        self.assertEqual(doc.para_ends, loaded.para_ends)
+        self.assertEqual(5, len(loaded))
+        self.check(loaded, 'simple')
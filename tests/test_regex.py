@@ -24,3 +24,20 @@ class TestRegex(unittest.TestCase):
             chunk = "<>"
         self.assertEqual("Snozz;  ^", chunk)
 
+
+    def test_fast_tokenise(self):
+        # The default separators' fast path gives the same chunks as the
+        # generic regex, including Unicode whitespace and separator-only lines
+        paras = [["Snozz  wozz", "  indented\tline. ", "", "\u00a0", "last"],
+                 ["   leading", "trailing   "],
+                 ["   "],
+                 ["one"]]
+        reo = justifier.make_word_regex(justifier.DEFAULT_SEP_REGEX)
+        for para in paras:
+            self.assertEqual(justifier.tokenise(para, reo), justifier.tokenise(para))
+        self.assertEqual([("Snozz", "  "), ("wozz", "   "), ("indented", "\t"), ("line.", "   \u00a0 "), ("last", "")],
+                         justifier.tokenise(paras[0]))
+
+    def test_custom_separators(self):
+        reo = justifier.make_word_regex(r"[,;]")
+        self.assertEqual([("a b", ","), ("c", ";; ,"), ("d", "")], justifier.tokenise(["a b,c;;", ",d"], reo))
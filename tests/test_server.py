@@ -0,0 +1,166 @@
+"""Tests for the justification daemon and client."""
+
+
+import os
+import json
+import socket
+import asyncio
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+from justifier import server
+from justifier.api import Justifier
+from .test_justifier import text_lines
+
+
+class TestServer(unittest.TestCase):
+    """Tests for `justifier.server`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmpdir.name, "test.sock")
+        self.server = server.JustifierServer({'hyphenation': 'none'})
+        self.thread = threading.Thread(target=asyncio.run, args=(self.server.serve(self.socket_path),))
+        self.thread.start()
+        self.assertTrue(self.server.ready.wait(10))
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.server.stop()
+        self.thread.join()
+        self.assertFalse(os.path.exists(self.socket_path))
+        self.tmpdir.cleanup()
+
+    def test_request(self):
+        expected = Justifier(line_width=30, indent=2, hyphenation='simple', seed=4).justify(text_lines)
+        options = {'line_width': 30, 'indent': 2, 'hyphenation': 'simple', 'seed': 4}
+        self.assertEqual(expected, server.request(text_lines, options, self.socket_path))
+
+    def test_defaults(self):
+        expected = Justifier(hyphenation='none', seed=0).justify(text_lines)
+        self.assertEqual(expected, server.request(text_lines, {'seed': 0}, self.socket_path))
+
+    def test_concurrent(self):
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda w: server.request(text_lines, {'line_width': w, 'seed': 1}, self.socket_path),
+                                    range(20, 60)))
+        for width, result in zip(range(20, 60), results):
+            self.assertEqual(Justifier(line_width=width, hyphenation='none', seed=1).justify(text_lines), result)
+
+    def test_several_requests_per_connection(self):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.socket_path)
+            for width in (30, 40):
+                sock.sendall(server.encode_message({'text': "a b c", 'options': {'line_width': width}}))
+                size, = server.HEADER.unpack(server.recv_exactly(sock, server.HEADER.size))
+                self.assertEqual({'text': "a b c"}, server.decode_message(server.recv_exactly(sock, size)))
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            server.request("text", {'bogus': 1}, self.socket_path)
+        with self.assertRaises(ValueError):
+            server.request("text", {'hyphenation': 'bogus'}, self.socket_path)
+        # The daemon is still serving
+        self.assertEqual("text", server.request("text", {}, self.socket_path))
+
+    def test_unexpected_error(self):
+        self.server.defaults['hyphen_dict_file'] = os.path.join(self.tmpdir.name, "missing.hyd")
+        with self.assertLogs("server", "WARNING"):
+            reply = self.server.handle_request({'text': "text", 'options': {'hyphenation': 'pyphen'}})
+        self.assertIn("FileNotFoundError", reply['error'])
+        self.assertEqual("text", server.request("text", {}, self.socket_path))
+
+    def test_socket_permissions(self):
+        self.assertEqual(0o600, os.stat(self.socket_path).st_mode & 0o777)
+
+    def test_already_running(self):
+        with self.assertRaises(OSError):
+            server.remove_stale_socket(self.socket_path)
+
+    def test_client(self):
+        from click.testing import CliRunner
+        from justifier import cli
+
+        # Options that aren't given are left to the daemon, which doesn't hyphenate
+        expected = Justifier(line_width=30, hyphenation='none', seed=2).justify(text_lines) + "\n"
+        result = CliRunner().invoke(cli.main, ['--client', '--socket', self.socket_path, '-w', '30', '--seed', '2'],
+                                    input=text_lines)
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertEqual(expected, result.output)
+
+        for args in (['--stream'], ['--engine', 'pipeline'], ['-j', '2'], ['--stats'], ['--buffer-size', '10'],
+                     ['--hyphen-cache', "hyphens.json"], ['--hyphen-cache-size', '0']):
+            result = CliRunner().invoke(cli.main, ['--client', '--socket', self.socket_path] + args, input="text")
+            self.assertEqual(2, result.exit_code)
+            self.assertIn("can't be used with --client", result.output)
+
+    def test_client_connection_dropped(self):
+        from click.testing import CliRunner
+        from justifier import cli
+
+        # Something that accepts a request and hangs up without replying
+        socket_path = os.path.join(self.tmpdir.name, "dropped.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+            listener.bind(socket_path)
+            listener.listen(1)
+
+            def drop():
+                conn, _ = listener.accept()
+                with conn:
+                    conn.recv(1024)
+
+            thread = threading.Thread(target=drop)
+            thread.start()
+            result = CliRunner().invoke(cli.main, ['--client', '--socket', socket_path], input="text")
+            thread.join()
+        self.assertEqual(1, result.exit_code, result.output)
+        self.assertIn("Bad reply from the daemon", result.output)
+
+    def test_dict_file_default(self):
+        # A daemon's compiled dictionary doesn't stop requests turning hyphenation off
+        engine = server.JustifierServer({'hyphen_dict_file': "unused.hyd"}).get_engine({'hyphenation': 'none'})
+        self.assertEqual('none', engine.options.hyphenation)
+
+
+class TestRunServer(unittest.TestCase):
+    """Tests for `server.run_server`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmpdir.cleanup()
+
+    def test_hyphen_cache_file(self):
+        socket_path = os.path.join(self.tmpdir.name, "test.sock")
+        cache_file = os.path.join(self.tmpdir.name, "hyphens.json")
+        servers = []
+        JustifierServer = server.JustifierServer
+
+        def make_server(*args):
+            servers.append(JustifierServer(*args))
+            return servers[-1]
+
+        with mock.patch.object(server, 'JustifierServer', make_server):
+            thread = threading.Thread(target=server.run_server, args=(socket_path, {'seed': 0}, cache_file, 10))
+            thread.start()
+            try:
+                while not servers:
+                    thread.join(0.01)
+                self.assertTrue(servers[0].ready.wait(10))
+                self.assertEqual(10, servers[0].hyphen_cache.maxsize)
+                server.request(text_lines, {'line_width': 20, 'hyphenation': 'pyphen', 'lang': 'en_US'}, socket_path)
+            finally:
+                servers[0].stop()
+                thread.join()
+
+        with open(cache_file, encoding="utf-8") as f:
+            words = json.load(f)['langs']['en_US']
+        self.assertEqual(10, len(words))
+        self.assertLessEqual(set(words), set(text_lines.split()))
@@ -0,0 +1,73 @@
+"""Tests that startup stays cheap: heavy modules are only imported when needed."""
+
+
+import os
+import sys
+import subprocess
+import unittest
+
+import justifier
+
+
+# Generous, so that only a real regression (e.g. an eager import of pyphen or
+# multiprocessing) trips it on a slow machine
+STARTUP_BUDGET_US = 400000
+HEAVY_MODULES = ('pyphen', 'asyncio', 'multiprocessing', 'concurrent.futures.process',
+                 'justifier.parallel', 'justifier.server', 'justifier.api')
+
+
+def run_python(*args) -> subprocess.CompletedProcess:
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(justifier.__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([package_dir, os.environ.get('PYTHONPATH', '')]))
+    return subprocess.run([sys.executable] + list(args), capture_output=True, text=True, env=env, check=True)
+
+
+def imported_after(code: str):
+    """
+    Names of the heavy modules that are imported after running `code`.
+    """
+
+    result = run_python("-c", "import sys\n" + code +
+                        "\nprint('\\n' + ' '.join(m for m in %r if m in sys.modules))" % (HEAVY_MODULES,))
+    # The last line, after anything that `code` prints
+    return result.stdout.split("\n")[-2].split()
+
+
+class TestStartup(unittest.TestCase):
+    """Tests for import times."""
+
+    def test_import_time(self):
+        result = run_python("-X", "importtime", "-c", "import justifier.cli")
+        # Lines are "import time: self [us] | cumulative | imported package"
+        times = {}
+        for line in result.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[1].strip().isdigit():
+                times[fields[2].strip()] = int(fields[1])
+        self.assertLess(times['justifier.cli'], STARTUP_BUDGET_US)
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, times)
+
+    def test_help(self):
+        self.assertEqual([], imported_after("from justifier import cli\n"
+                                           "cli.main(['--help'], standalone_mode=False)"))
+
+    def test_no_hyphenation(self):
+        self.assertEqual([], imported_after("from justifier import cli\n"
+                                            "cli.main(['-H', %r], standalone_mode=False)"
+                                            % os.path.join(os.path.dirname(__file__), "short.txt")))
+
+    def test_pyphen_loaded_when_needed(self):
+        self.assertEqual(['pyphen'], imported_after("from justifier import justifier, hyphenation\n"
+                                                    "h = justifier.make_hyphenator('en_US', hyphenation.HyphenationCache())\n"
+                                                    "assert 'pyphen' not in sys.modules\n"
+                                                    "h.wrap('hyphenation', 6)"))
+
+    def test_api_without_jobs(self):
+        self.assertEqual(['justifier.api'], imported_after("from justifier.api import Justifier\n"
+                                                           "Justifier(hyphenation='none').justify('a b c')"))
+
+    def test_aio_without_workers(self):
+        imported = imported_after("from justifier import aio")
+        for module in ('multiprocessing', 'concurrent.futures.process', 'justifier.parallel'):
+            self.assertNotIn(module, imported)
@@ -0,0 +1,69 @@
+"""Tests for `justifier.utils`."""
+
+
+import io
+import os
+import tempfile
+import unittest
+
+from justifier import utils
+
+
+class TestReadLines(unittest.TestCase):
+    """Tests for `utils.read_lines`."""
+
+    data = "First line  \r\nSecond ŝ line\n\nLast line, no newline".encode("utf-8")
+    expected = ["First line", "Second ŝ line", "", "Last line, no newline"]
+
+    def test_stream(self):
+        # Small blocks split the multi-byte character
+        for block_size in (1, 3, 7, 1000):
+            batches = list(utils.read_lines(io.BytesIO(self.data), encoding="utf-8", block_size=block_size))
+            self.assertEqual(self.expected, [line for batch in batches for line in batch])
+
+    def test_regular_file(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            filename = os.path.join(dirname, "input.txt")
+            with open(filename, "wb") as f:
+                f.write(self.data)
+            with open(filename, "rb") as f:
+                batches = list(utils.read_lines(f, encoding="utf-8", block_size=5))
+        self.assertEqual(self.expected, [line for batch in batches for line in batch])
+
+    def test_long_line(self):
+        # A line spanning many blocks, then one ending in the middle of a block
+        data = b"x" * 1000 + b"\n" + b"y" * 10 + b"\nz"
+        batches = list(utils.read_lines(io.BytesIO(data), encoding="utf-8", block_size=7))
+        self.assertEqual(["x" * 1000, "y" * 10, "z"], [line for batch in batches for line in batch])
+        self.assertNotIn([], batches)
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Tests for `utils.Instrumentation`."""
+
+    def test_pipeline(self):
+        from justifier import justifier
+
+        stats = utils.Instrumentation()
+        options = {'line_width': 20, 'hyphenation': 'simple', 'seed': 0, 'stats': stats}
+        for reformat in (justifier.reformat, justifier.select_reformat(options, 'fused')):
+            p = utils.Pipeline(justifier.get_paras, (reformat, options), utils.Collector, instrumentation=stats)
+            p.send_all(["one two three four five six", "seven eight", "", "nine"])
+            p.close()
+            self.assertEqual(2, len(p.chain[-1].target.items))
+
+        self.assertEqual(4, stats.counters['paragraphs'])
+        self.assertEqual(18, stats.counters['words'])
+        self.assertEqual(8, stats.stages['get_paras'].items_in)
+        self.assertEqual(4, stats.stages['get_paras'].items_out)
+        self.assertEqual(2, stats.stages['reformat'].items_in)
+        self.assertEqual(2, stats.stages['fused_reformat'].items_in)
+        self.assertEqual(stats.stages['create_folded_para'].items_out, stats.stages['collate_lines'].items_in)
+        self.assertEqual(4, stats.stages['Collector'].items_in)
+        for stage in stats.stages.values():
+            self.assertGreaterEqual(stage.time, 0)
+        self.assertIn("create_folded_para", stats.summary())
+
+    def test_disabled(self):
+        p = utils.Pipeline(utils.Collector)
+        self.assertIsInstance(p.chain[0], utils.Collector)
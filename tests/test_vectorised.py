@@ -0,0 +1,48 @@
+"""Differential tests for the NumPy engine against the coroutine pipeline."""
+
+
+import unittest
+import random
+
+from justifier import justifier
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .test_fused import run, random_paras
+
+
+@unittest.skipUnless(numpy, "NumPy isn't installed")
+class TestNumpyEngine(unittest.TestCase):
+    """Tests for `justifier.vectorised`."""
+
+    def test_random_paras(self):
+        from justifier.vectorised import numpy_reformat
+
+        rng = random.Random(7)
+        paras = random_paras(rng, 300)
+        for options in ({'line_width': 40, 'hyphenation': 'simple', 'seed': 1},
+                        {'line_width': 12, 'indent': 4, 'hyphenation': 'simple', 'seed': 2},
+                        {'line_width': 72, 'hyphenation': 'none', 'seed': 3},
+                        {'line_width': 25, 'hyphenation': 'simple', 'seed': 4, 'sep_regex': r"[\s,]"}):
+            with self.subTest(**options):
+                self.assertEqual(run(justifier.reformat, paras, **options),
+                                 run(numpy_reformat, paras, **options))
+
+    def test_select(self):
+        from justifier.vectorised import numpy_reformat
+
+        self.assertIs(numpy_reformat, justifier.select_reformat({}, 'numpy'))
+        with self.assertRaises(ValueError):
+            justifier.select_reformat({'optimal': True}, 'numpy')
+
+
+@unittest.skipIf(numpy, "NumPy is installed")
+class TestWithoutNumpy(unittest.TestCase):
+    """Tests for the numpy engine when NumPy isn't installed."""
+
+    def test_select(self):
+        with self.assertRaises(ValueError):
+            justifier.select_reformat({}, 'numpy')